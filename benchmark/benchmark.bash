@@ -0,0 +1,20 @@
+#!/bin/bash
+
+# ========== Path Configuration ==========
+WORK_DIR="path/to/your/benchmark/work/dir"
+BASELINE="" # earlier bench_results.json to compare against (optional)
+
+# ========== Benchmark Configuration ==========
+CONCURRENCY="4,16,64"
+ITEMS_PER_SCENE=20
+EVAL_ITEMS=300
+LATENCY_MS=300 # mean latency of the mock API server
+
+# ========== Run Benchmark ==========
+python VisualTrans/benchmark/pipeline_bench.py \
+    --work_dir "$WORK_DIR" \
+    --concurrency "$CONCURRENCY" \
+    --items_per_scene $ITEMS_PER_SCENE \
+    --eval_items $EVAL_ITEMS \
+    --latency_ms $LATENCY_MS \
+    ${BASELINE:+--baseline "$BASELINE"}
@@ -0,0 +1,352 @@
+"""
+End-to-end throughput benchmark for the four pipeline stages.
+
+Generates a synthetic image corpus and benchmark file, starts the mock
+OpenAI-compatible server (common/mock_server.py) and runs data filtering, meta
+annotation, QA generation and evaluation as subprocesses at several concurrency
+levels. For every run it records items/sec, CPU time and peak RSS of the stage
+process (from os.wait4) and request latency percentiles, and writes everything
+to a JSON file. Pass an earlier result file with --baseline to flag throughput
+regressions.
+
+Usage:
+    python VisualTrans/benchmark/pipeline_bench.py --work_dir /tmp/vt_bench --concurrency 4,16,64
+"""
+
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+import urllib.request
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Scenes read by data_filter.py and add_meta.py
+FILTER_SCENES = [
+    "assemble_disassemble_legos", "build_unstack_lego", "assemble_disassemble_soft_legos",
+    "stack_unstack_bowls", "make_sandwich", "insert_remove_bookshelf", "pick_place_food",
+    "sort_beads", "stack_unstack_plates",
+]
+META_SCENES = [
+    "stack_unstack_bowls", "setup_cleanup_table", "insert_remove_bookshelf", "pick_place_food",
+    "sort_beads", "insert_remove_cups_from_rack", "assemble_disassemble_legos", "make_sandwich",
+    "build_unstack_lego", "play_reset_connect_four", "screw_unscrew_fingers_fixture", "add_remove_lid",
+]
+TWO_STAGE_SCENES = ["assemble_disassemble_legos", "stack_unstack_bowls", "stack_unstack_plates"]
+QA_SCRIPTS = [
+    "count", "spatial_global", "spatial_fine_grained_1", "spatial_fine_grained_2",
+    "procedural_plan_1", "procedural_plan_2", "procedural_interm", "procedural_causal",
+]
+TASK_TYPES = [
+    ("spatial_fine_grained", 2), ("spatial_global", 2), ("procedural_plan", 2),
+    ("procedural_causal", 2), ("count", 2), ("procedural_interm", 6),
+]
+STAGES = ["filter", "meta", "qa", "eval"]
+
+
+# ========== Synthetic Corpus ==========
+def make_jpegs(count, width, height, seed):
+    """Encode `count` distinct JPEGs of colored blocks on a tabletop-like background"""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    images = []
+    for _ in range(count):
+        image = Image.new("RGB", (width, height), tuple(rng.randint(60, 200) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(12):
+            x, y = rng.randint(0, width - 1), rng.randint(0, height - 1)
+            w, h = rng.randint(width // 20, width // 5), rng.randint(height // 20, height // 5)
+            draw.rectangle([x, y, x + w, y + h], fill=tuple(rng.randint(0, 255) for _ in range(3)))
+        # Sensor-like noise keeps file sizes close to real photos
+        noise = Image.effect_noise((width, height), 24).convert("RGB")
+        image = Image.blend(image, noise, 0.15)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def generate_corpus(corpus_dir, items_per_scene, eval_items, width, height, seed=0):
+    """Write images, crops and a benchmark JSON under corpus_dir; return their paths"""
+    image_dir = os.path.join(corpus_dir, "images")
+    crop_dir = os.path.join(corpus_dir, "crops")
+    benchmark_path = os.path.join(corpus_dir, "benchmark.json")
+    marker = os.path.join(corpus_dir, "corpus.json")
+    config = {'items_per_scene': items_per_scene, 'eval_items': eval_items, 'width': width, 'height': height, 'seed': seed}
+    if os.path.exists(marker):
+        with open(marker, "r") as f:
+            if json.load(f) == config:
+                print(f"Reusing synthetic corpus in {corpus_dir}")
+                return image_dir, crop_dir, benchmark_path
+        shutil.rmtree(corpus_dir)
+
+    print(f"Generating synthetic corpus in {corpus_dir}")
+    rng = random.Random(seed)
+    jpegs = make_jpegs(16, width, height, seed)
+
+    def write(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(rng.choice(jpegs))
+
+    pairs = []
+    for scene in sorted(set(FILTER_SCENES) | set(META_SCENES)):
+        for i in range(items_per_scene):
+            prefix = f"{scene}_{i:05d}"
+            # play_reset_connect_four is annotated from the crop directory
+            base_dir = crop_dir if scene == "play_reset_connect_four" else image_dir
+            for suffix in ("start", "medium", "end"):
+                write(os.path.join(base_dir, scene, f"{prefix}_{suffix}.jpg"))
+            if scene in TWO_STAGE_SCENES:
+                for suffix in ("start", "end"):
+                    write(os.path.join(crop_dir, scene, f"{prefix}_{suffix}.jpg"))
+            if base_dir == image_dir:
+                pairs.append((scene, prefix))
+
+    data = []
+    for i in range(eval_items):
+        task_type, num_images = TASK_TYPES[i % len(TASK_TYPES)]
+        scene, prefix = pairs[i % len(pairs)]
+        images = [f"{scene}/{prefix}_start.jpg", f"{scene}/{prefix}_end.jpg"]
+        images += [f"{s}/{p}_medium.jpg" for s, p in rng.sample(pairs, num_images - 2)]
+        data.append({
+            "task_type": task_type,
+            "images": images,
+            "scene": scene,
+            "question": f"Synthetic question {i}: which operation happened?\nA. one\nB. two\nC. three\nD. four",
+            "label": rng.choice("ABCD"),
+        })
+    with open(benchmark_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    with open(marker, "w") as f:
+        json.dump(config, f)
+    return image_dir, crop_dir, benchmark_path
+
+
+# ========== Mock Server ==========
+def start_mock_server(args):
+    command = [
+        sys.executable, os.path.join(REPO_DIR, "common", "mock_server.py"),
+        "--port", str(args.port), "--latency", args.latency, "--latency_ms", str(args.latency_ms),
+        "--per_image_ms", str(args.per_image_ms), "--error_rate", str(args.error_rate),
+        "--rate_limit_rate", str(args.rate_limit_rate), "--seed", str(args.seed),
+    ]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            mock_request(args.port, "stats")
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"Mock server did not start on port {args.port}")
+
+
+def mock_request(port, endpoint, method="GET"):
+    request = urllib.request.Request(f"http://127.0.0.1:{port}/v1/{endpoint}", method=method, data=b"" if method == "POST" else None)
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+
+# ========== Stage Runs ==========
+def stage_command(stage, concurrency, paths, run_dir, args):
+    """Command line running one stage against the mock server, writing under run_dir"""
+    image_dir, crop_dir, benchmark_path = paths
+    client = ["--base_url", f"http://127.0.0.1:{args.port}/v1", "--api_key", "mock"]
+    if stage == "filter":
+        return [[sys.executable, os.path.join(REPO_DIR, "filter", "data_filter.py"),
+                 "--image_base_dir", image_dir, "--filter_base_dir", run_dir,
+                 "--model", "mock", "--max_workers", str(concurrency)] + client]
+    if stage == "meta":
+        return [[sys.executable, os.path.join(REPO_DIR, "meta_annotation", "add_meta.py"),
+                 "--image_dir", image_dir, "--crop_dir", crop_dir, "--meta_output_dir", run_dir,
+                 "--model", "mock", "--num_threads", str(concurrency)] + client]
+    if stage == "qa":
+        return [[sys.executable, os.path.join(REPO_DIR, "qa_gen", f"{script}.py"),
+                 "--meta_dir", args.meta_dir, "--output_file", os.path.join(run_dir, f"{script}.json")]
+                for script in QA_SCRIPTS]
+    engine = ["--engine", "async", "--max_in_flight", str(concurrency)] if args.eval_engine == "async" else ["--threads", str(concurrency)]
+    return [[sys.executable, os.path.join(REPO_DIR, "eval", "eval_model.py"),
+             "--model", "mock", "--benchmark_path", benchmark_path, "--image_base", image_dir,
+             "--result_dir", run_dir] + engine + client]
+
+
+def count_items(stage, run_dir):
+    """Number of items a stage produced in run_dir"""
+    if stage == "qa":
+        total = 0
+        for path in glob.glob(os.path.join(run_dir, "*.json")):
+            with open(path, "r", encoding="utf-8") as f:
+                total += len(json.load(f))
+        return total
+    pattern = {"filter": "*_filter.jsonl", "meta": "*_meta.jsonl", "eval": "eval_*.jsonl"}[stage]
+    total = 0
+    for path in glob.glob(os.path.join(run_dir, pattern)):
+        with open(path, "rb") as f:
+            total += sum(1 for line in f if line.strip())
+    return total
+
+
+def run_process(command, log):
+    """Run a command; return (returncode, wall seconds, user CPU, system CPU, peak RSS in MB)"""
+    start = time.monotonic()
+    process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, cwd=REPO_DIR)
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.monotonic() - start
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return process.returncode, wall, usage.ru_utime, usage.ru_stime, rss_mb
+
+
+def run_stage(stage, concurrency, paths, args):
+    run_dir = os.path.join(args.work_dir, "runs", f"{stage}_c{concurrency}")
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.makedirs(run_dir)
+    mock_request(args.port, "stats/reset", method="POST")
+
+    result = {'stage': stage, 'concurrency': concurrency, 'returncode': 0, 'wall_s': 0.0,
+              'cpu_user_s': 0.0, 'cpu_system_s': 0.0, 'peak_rss_mb': 0.0}
+    with open(os.path.join(run_dir, "stage.log"), "wb") as log:
+        for command in stage_command(stage, concurrency, paths, run_dir, args):
+            returncode, wall, user, system, rss_mb = run_process(command, log)
+            result['returncode'] = result['returncode'] or returncode
+            result['wall_s'] += wall
+            result['cpu_user_s'] += user
+            result['cpu_system_s'] += system
+            result['peak_rss_mb'] = max(result['peak_rss_mb'], rss_mb)
+
+    result['items'] = count_items(stage, run_dir)
+    result['items_per_s'] = result['items'] / result['wall_s'] if result['wall_s'] > 0 else 0.0
+    server = mock_request(args.port, "stats")
+    result['requests'] = server['requests']
+    result['max_in_flight'] = server['max_in_flight']
+    result['server_latency_s'] = server.get('latency_s')
+    summary_path = os.path.join(run_dir, "eval_mock_summary.json")
+    if stage == "eval" and os.path.exists(summary_path):
+        # Client-side latency including queueing and retries
+        with open(summary_path, "r") as f:
+            total = json.load(f)['overall'].get('total_s', {})
+        result['client_latency_s'] = {q: total.get(q) for q in ('p50', 'p95', 'p99')}
+    if stage == "meta":
+        # QA generation runs on the meta annotations of the last meta run
+        args.meta_dir = run_dir
+    for key, value in result.items():
+        if isinstance(value, float):
+            result[key] = round(value, 3)
+    return result
+
+
+# ========== Reporting ==========
+def print_results(results):
+    print(f"\n{'stage':<8}{'conc':>6}{'items':>8}{'wall s':>9}{'items/s':>10}{'cpu s':>8}{'rss MB':>8}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}")
+    for r in results:
+        latency = r.get('client_latency_s') or r.get('server_latency_s') or {}
+        cells = [latency.get(q) for q in ('p50', 'p95', 'p99')]
+        print(f"{r['stage']:<8}{r['concurrency']:>6}{r['items']:>8}{r['wall_s']:>9.2f}{r['items_per_s']:>10.2f}"
+              f"{r['cpu_user_s'] + r['cpu_system_s']:>8.2f}{r['peak_rss_mb']:>8.1f}"
+              + "".join(f"{c:>8.3f}" if c is not None else f"{'-':>8}" for c in cells)
+              + ("  FAILED" if r['returncode'] else ""))
+
+
+def compare_baseline(results, baseline_path, tolerance):
+    """Print throughput changes against an earlier result file; return the number of regressions"""
+    with open(baseline_path, "r") as f:
+        baseline = {(r['stage'], r['concurrency']): r for r in json.load(f)['results']}
+    regressions = 0
+    print(f"\nComparison with {baseline_path}:")
+    for r in results:
+        old = baseline.get((r['stage'], r['concurrency']))
+        if not old or not old['items_per_s']:
+            continue
+        change = r['items_per_s'] / old['items_per_s'] - 1
+        flag = ""
+        if change < -tolerance:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{r['stage']:<8}{r['concurrency']:>6}  {old['items_per_s']:>9.2f} -> {r['items_per_s']:>9.2f} items/s ({change:+.1%}){flag}")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pipeline stage throughput against a mock API server')
+    parser.add_argument('--work_dir', type=str, required=True, help='Directory for the synthetic corpus and stage outputs')
+    parser.add_argument('--output', type=str, default=None, help='Result JSON file (default: <work_dir>/bench_results.json)')
+    parser.add_argument('--stages', type=str, default=','.join(STAGES), help='Comma-separated stages to run: filter,meta,qa,eval')
+    parser.add_argument('--concurrency', type=str, default='4,16,64', help='Comma-separated concurrency levels (threads / in-flight requests per stage)')
+    parser.add_argument('--items_per_scene', type=int, default=20, help='Synthetic image pairs per scene')
+    parser.add_argument('--eval_items', type=int, default=300, help='Synthetic benchmark items for the evaluation stage')
+    parser.add_argument('--image_size', type=str, default='1280x720', help='Synthetic image size, WIDTHxHEIGHT')
+    parser.add_argument('--eval_engine', type=str, default='thread', choices=['thread', 'async'], help='Execution engine of eval_model.py')
+    parser.add_argument('--port', type=int, default=8765, help='Port of the mock server')
+    parser.add_argument('--latency', type=str, default='lognormal', help='Mock server latency distribution')
+    parser.add_argument('--latency_ms', type=float, default=300.0, help='Mean mock server latency (ms)')
+    parser.add_argument('--per_image_ms', type=float, default=20.0, help='Extra mock latency (ms) per image')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='Fraction of mock requests answered with HTTP 500')
+    parser.add_argument('--rate_limit_rate', type=float, default=0.0, help='Fraction of mock requests answered with HTTP 429')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the corpus and the mock server')
+    parser.add_argument('--baseline', type=str, default=None, help='Earlier result file to compare throughput against')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Throughput drop (fraction) reported as a regression')
+    args = parser.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    if 'qa' in stages and 'meta' not in stages:
+        parser.error("the qa stage needs the meta stage to produce its input")
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    width, height = (int(v) for v in args.image_size.lower().split('x'))
+    # Set by the meta stage, whose output is the input of QA generation
+    args.meta_dir = None
+
+    paths = generate_corpus(os.path.join(args.work_dir, "corpus"), args.items_per_scene, args.eval_items, width, height, args.seed)
+    server = start_mock_server(args)
+    results = []
+    try:
+        for stage in [s for s in STAGES if s in stages]:
+            # QA generation is single-threaded, one run is enough
+            for concurrency in ([1] if stage == "qa" else levels):
+                print(f"Running {stage} at concurrency {concurrency}...")
+                results.append(run_stage(stage, concurrency, paths, args))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print_results(results)
+    output = args.output or os.path.join(args.work_dir, "bench_results.json")
+    report = {
+        'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline', 'meta_dir')},
+        'results': results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResults saved to {output}")
+
+    failed = [r for r in results if r['returncode']]
+    regressions = compare_baseline(results, args.baseline, args.tolerance) if args.baseline else 0
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    exit(main())
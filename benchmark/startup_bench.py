@@ -0,0 +1,128 @@
+"""
+Startup-time benchmark of the pipeline entry points.
+
+For every script it measures the wall time of `--help` (interpreter start,
+imports and argument parsing) and, where it needs no API or model weights, of
+a minimal run on a tiny synthetic input: scoring a three-item result file and
+running each QA generator on an empty meta directory. With --importtime the
+slowest imports of each `--help` run are listed as well (python -X importtime).
+
+Usage:
+    python VisualTrans/benchmark/startup_bench.py --repeat 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = [
+    "eval/eval_model.py", "eval/cal_score.py", "eval/significance.py", "eval/breakdown.py",
+    "eval/merge_shards.py", "eval/bench_extract.py", "eval/score_server.py", "filter/data_filter.py",
+    "meta_annotation/add_meta.py", "meta_annotation/crop_with_grounding_dino.py",
+    "qa_gen/count.py", "qa_gen/spatial_global.py", "qa_gen/spatial_fine_grained_1.py",
+    "qa_gen/spatial_fine_grained_2.py", "qa_gen/procedural_plan_1.py", "qa_gen/procedural_plan_2.py",
+    "qa_gen/procedural_interm.py", "qa_gen/procedural_causal.py", "common/mock_server.py",
+]
+
+SAMPLE_RESULTS = [
+    {"task_type": "count", "scene": "pick_place_food", "images": ["a_start.jpg", "a_end.jpg"],
+     "question": "How many food items are in the plate now that were not there before?", "label": "2",
+     "assistant": "<answer>2</answer>"},
+    {"task_type": "procedural_causal", "scene": "make_sandwich", "images": ["b_start.jpg", "b_end.jpg"],
+     "question": "Identify which of the following operations is most likely to have happened?\nA. x\nB. y",
+     "label": "B", "assistant": "<answer>A</answer>"},
+    {"task_type": "spatial_fine_grained", "scene": "stack_unstack_bowls", "images": ["c_start.jpg", "c_end.jpg"],
+     "question": "After the transformation, list all objects that are positioned above the red bowl.",
+     "label": "blue bowl, green bowl", "assistant": "Final Answer: green bowl, blue bowl"},
+]
+
+
+def time_command(command, repeat, cwd):
+    """Median and minimum wall time (s) of a command, and its last exit code"""
+    times, returncode = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        returncode = subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), min(times), returncode
+
+
+def slowest_imports(script, top):
+    """(cumulative ms, module) of the slowest top-level imports of `script --help`"""
+    result = subprocess.run([sys.executable, "-X", "importtime", script, "--help"], cwd=REPO_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Top-level imports are the ones indented by a single space
+        if cumulative.strip().isdigit() and name.startswith(" ") and not name.startswith("  "):
+            imports.append((int(cumulative) / 1000, name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def minimal_runs(work_dir):
+    """(entry point, label, command) of the runs that need no API, GPU or real data"""
+    result_dir = os.path.join(work_dir, "result")
+    meta_dir = os.path.join(work_dir, "meta")
+    os.makedirs(result_dir, exist_ok=True)
+    os.makedirs(meta_dir, exist_ok=True)
+    with open(os.path.join(result_dir, "eval_startup.jsonl"), "w", encoding="utf-8") as f:
+        for item in SAMPLE_RESULTS:
+            f.write(json.dumps(item) + "\n")
+
+    runs = [
+        ("eval/cal_score.py", "score 3 items",
+         ["eval/cal_score.py", "--model", "startup", "--result_dir", result_dir, "--no_excel"]),
+        ("eval/cal_score.py", "score 3 items + Excel",
+         ["eval/cal_score.py", "--model", "startup", "--result_dir", result_dir]),
+    ]
+    for script in ENTRY_POINTS:
+        if script.startswith("qa_gen/"):
+            output = os.path.join(work_dir, os.path.basename(script).replace(".py", ".json"))
+            runs.append((script, "empty meta dir", [script, "--meta_dir", meta_dir, "--output_file", output]))
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup time of the pipeline entry points')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (median and min are reported)')
+    parser.add_argument('--scripts', type=str, default=None, help='Comma-separated entry points (default: all), e.g. eval/cal_score.py')
+    parser.add_argument('--importtime', type=int, default=0, help='List this many slowest imports of each --help run')
+    parser.add_argument('--output', type=str, default=None, help='Also write the measurements to this JSON file')
+    args = parser.parse_args()
+
+    scripts = args.scripts.split(',') if args.scripts else ENTRY_POINTS
+    baseline, _, _ = time_command([sys.executable, "-c", "pass"], args.repeat, REPO_DIR)
+    print(f"Bare interpreter start: {baseline * 1000:.0f} ms (median of {args.repeat})")
+    print(f"{'entry point':<46}{'run':<24}{'median ms':>10}{'min ms':>9}")
+
+    measurements = []
+    with tempfile.TemporaryDirectory(prefix="vt_startup_") as work_dir:
+        runs = [(script, "--help", [script, "--help"]) for script in scripts]
+        runs += [run for run in minimal_runs(work_dir) if run[0] in scripts]
+        for script, label, command in runs:
+            median, fastest, returncode = time_command([sys.executable] + command, args.repeat, REPO_DIR)
+            status = "" if returncode == 0 else f"  (exit {returncode})"
+            print(f"{script:<46}{label:<24}{median * 1000:>10.0f}{fastest * 1000:>9.0f}{status}")
+            measurements.append({'script': script, 'run': label, 'median_s': median, 'min_s': fastest, 'returncode': returncode})
+            if args.importtime and label == "--help":
+                for ms, module in slowest_imports(script, args.importtime):
+                    print(f"    {module:<40}{ms:>8.0f} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version, 'interpreter_start_s': baseline, 'runs': measurements}, f, indent=2)
+        print(f"Saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
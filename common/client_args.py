@@ -0,0 +1,28 @@
+"""
+Command line options for pointing a script's OpenAI client at another endpoint,
+e.g. the bundled mock server (common/mock_server.py).
+"""
+
+from openai import OpenAI
+
+
+def add_client_args(parser):
+    """Register the API endpoint command line options on an argparse parser"""
+    parser.add_argument('--base_url', type=str, default=None, help='OpenAI-compatible API base URL (overrides the one in the script)')
+    parser.add_argument('--api_key', type=str, default=None, help='API key (overrides the one in the script)')
+
+
+def client_from_args(args, client):
+    """Return a copy of `client` using the endpoint given on the command line, if any.
+
+    The scripts retry failed requests themselves (and feed every failure to
+    their rate limiter and circuit breaker), so the SDK's own retries are
+    turned off.
+    """
+    if not args.base_url and not args.api_key:
+        return client.with_options(max_retries=0)
+    return OpenAI(
+        api_key=args.api_key or client.api_key,
+        base_url=args.base_url or client.base_url,
+        max_retries=0,
+    )
@@ -0,0 +1,430 @@
+"""
+Mock OpenAI-compatible server for load-testing the pipeline offline.
+
+Serves /v1/chat/completions with canned responses in the format each script
+parses: <answer> tags for eval_model.py, a #Final Answer: line for
+data_filter.py and the `# Field:` blocks requested by the add_meta.py prompts.
+Latency follows a configurable distribution, and server errors and 429s can be
+injected at given rates. The files and batches endpoints used by
+`eval_model.py --mode batch` are served as well. GET /v1/stats reports what
+the server has seen, with handling latency percentiles, and POST
+/v1/stats/reset clears it.
+
+Usage:
+    python VisualTrans/common/mock_server.py --port 8000 --latency lognormal --latency_ms 800
+    python VisualTrans/eval/eval_model.py ... --base_url http://127.0.0.1:8000/v1 --api_key mock
+"""
+
+import argparse
+import email.parser
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+OBJECTS = ['red block', 'blue block', 'green cup', 'yellow bowl', 'white plate', 'orange book']
+
+# Canned values for the `# Field:` lines requested by the meta annotation prompts
+META_FIELDS = [
+    ('# Completed image:', lambda rng: f"Image {rng.choice([1, 2])}"),
+    ('# Hands_covered:', lambda rng: rng.choice(['yes', 'no'])),
+    ('# Object list:', lambda rng: f"[{', '.join(rng.sample(OBJECTS, 3))}]"),
+    ('# Position:', lambda rng: "right:{}, left:{}, closest:{}".format(*rng.sample(OBJECTS, 3))),
+    ('# Scene graph (Image 1):', lambda rng: scene_graph(rng)),
+    ('# Scene graph (Image 2):', lambda rng: scene_graph(rng)),
+    ('# Scene graph:', lambda rng: scene_graph(rng)),
+    ('# Completed structure (Image 1):', lambda rng: f"[{', '.join(rng.sample(OBJECTS, 3))}]"),
+    ('# Completed structure (Image 2):', lambda rng: f"[{', '.join(rng.sample(OBJECTS, 3))}]"),
+    ('# Completed structure:', lambda rng: f"[{', '.join(rng.sample(OBJECTS, 3))}]"),
+    ('# Plate contents (Image 1):', lambda rng: f"[{', '.join(rng.sample(OBJECTS, 2))}]"),
+    ('# Plate contents (Image 2):', lambda rng: f"[{', '.join(rng.sample(OBJECTS, 2))}]"),
+    ('# Number of groups:', lambda rng: str(rng.randint(2, 5))),
+]
+
+
+def scene_graph(rng):
+    a, b, c = rng.sample(OBJECTS, 3)
+    return f"({a}, on, {b}), ({c}, left, {a})"
+
+
+def lego_structure(rng):
+    objects = rng.sample(OBJECTS, 3)
+    lines = []
+    for layer, obj in enumerate(objects, 1):
+        above = objects[layer] if layer < len(objects) else 'none'
+        below = objects[layer - 2] if layer > 1 else 'none'
+        lines.append(f"- Object: {obj}\n  Layer: {layer}\n  Above: {above}\n  Below: {below}")
+    return "\n".join(lines)
+
+
+def prompt_text(messages):
+    parts = []
+    for message in messages:
+        content = message.get('content')
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(part.get('text', '') for part in content if part.get('type') == 'text')
+    return "\n".join(parts)
+
+
+def count_images(messages):
+    return sum(
+        1 for message in messages if isinstance(message.get('content'), list)
+        for part in message['content'] if part.get('type') == 'image_url'
+    )
+
+
+def eval_answer(prompt, rng):
+    question = prompt.rsplit('<answer>white block, green block</answer>', 1)[-1]
+    options = re.findall(r'(?:^|\s)([A-H])[.)]\s', question)
+    if options:
+        return rng.choice(sorted(set(options)))
+    object_list = re.search(r'object list:\s*(.+)', question, re.IGNORECASE)
+    if object_list:
+        names = [name.strip(' .') for name in object_list.group(1).split(',') if name.strip(' .')]
+        return ', '.join(rng.sample(names, rng.randint(1, len(names)))) if names else 'none'
+    return str(rng.randint(0, 5))
+
+
+def canned_response(messages):
+    """Build a response in the format the requesting script expects.
+
+    The text is derived from the prompt, so identical requests get identical responses.
+    """
+    prompt = prompt_text(messages)
+    rng = random.Random(hashlib.sha256(prompt.encode('utf-8')).digest())
+
+    if '<answer>' in prompt:
+        return f"<think>Comparing the initial and final images.</think>\n<answer>{eval_answer(prompt, rng)}</answer>"
+
+    if 'final answer' in prompt.lower() and '# Object list' not in prompt:
+        answer = 'Yes' if rng.random() < 0.8 else 'No'
+        return (f"#Thought:\nThe objects are checked in both images.\n\n"
+                f"#Final Answer: {answer}\n\n#Reason:\nMock response.")
+
+    lines = []
+    surface = re.search(r'# Surface type:\s*([^\n]+)', prompt)
+    if surface:
+        lines.append(f"# Surface type: {rng.choice([s.strip() for s in surface.group(1).split('/')])}")
+    for field, value in META_FIELDS:
+        if field in prompt and not any(line.startswith(field) for line in lines):
+            lines.append(f"{field} {value(rng)}")
+    if '# Completed lego structure:' in prompt:
+        lines.append(f"# Completed lego structure:\n{lego_structure(rng)}")
+    for image in (1, 2, 3):
+        if f'# Disc positions(Image {image}):' in prompt:
+            lines.append(f'# Disc positions(Image {image}): "red": [{{"row": 1, "col": {rng.randint(1, 7)}}}],'
+                         f'"yellow": [{{"row": 1, "col": {rng.randint(1, 7)}}}]')
+    return "\n".join(lines) if lines else "Mock response."
+
+
+class LatencyModel:
+    def __init__(self, distribution='fixed', latency_ms=200.0, sigma=0.5, per_image_ms=0.0, seed=None):
+        self.distribution = distribution
+        self.latency = latency_ms / 1000
+        self.sigma = sigma
+        self.per_image = per_image_ms / 1000
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self, num_images=0):
+        with self._lock:
+            if self.distribution == 'uniform':
+                base = self.rng.uniform(0, 2 * self.latency)
+            elif self.distribution == 'exponential':
+                base = self.rng.expovariate(1 / self.latency) if self.latency > 0 else 0.0
+            elif self.distribution == 'lognormal':
+                # Mean of the distribution equals latency_ms
+                base = self.rng.lognormvariate(math.log(self.latency) - self.sigma ** 2 / 2, self.sigma) if self.latency > 0 else 0.0
+            else:
+                base = self.latency
+        return base + num_images * self.per_image
+
+
+class MockState:
+    def __init__(self, args):
+        self.args = args
+        self.latency = LatencyModel(args.latency, args.latency_ms, args.latency_sigma, args.per_image_ms, args.seed)
+        self.rng = random.Random(args.seed)
+        self.files = {}
+        self.batches = {}
+        self.counters = {'requests': 0, 'completed': 0, 'errors': 0, 'rate_limited': 0, 'in_flight': 0, 'max_in_flight': 0}
+        self.request_times = []
+        self.latencies = []
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reset(self):
+        """Clear the counters, e.g. between benchmark runs"""
+        with self.lock:
+            self.counters = {key: 0 for key in self.counters}
+            self.request_times = []
+            self.latencies = []
+            self.started = time.monotonic()
+
+    def count(self, key, delta=1):
+        with self.lock:
+            self.counters[key] += delta
+            if key == 'in_flight':
+                self.counters['max_in_flight'] = max(self.counters['max_in_flight'], self.counters['in_flight'])
+
+    def fault(self):
+        """Return the injected failure for the next request: 429, 500 or None"""
+        with self.lock:
+            now = time.monotonic()
+            if self.args.rpm:
+                # Sliding one-minute window, like a provider rate limit
+                self.request_times = [t for t in self.request_times if t > now - 60]
+                if len(self.request_times) >= self.args.rpm:
+                    return 429
+                self.request_times.append(now)
+            roll = self.rng.random()
+        if roll < self.args.rate_limit_rate:
+            return 429
+        if roll < self.args.rate_limit_rate + self.args.error_rate:
+            return 500
+        return None
+
+    def completion(self, body):
+        messages = body.get('messages', [])
+        content = canned_response(messages)
+        prompt_tokens = len(prompt_text(messages)) // 4 + 765 * count_images(messages)
+        return {
+            'id': f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'mock'),
+            'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(content) // 4,
+                      'total_tokens': prompt_tokens + len(content) // 4},
+        }
+
+    def add_file(self, filename, data, purpose):
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        with self.lock:
+            self.files[file_id] = {
+                'id': file_id, 'object': 'file', 'bytes': len(data), 'created_at': int(time.time()),
+                'filename': filename, 'purpose': purpose, 'status': 'processed', 'data': data,
+            }
+        return self.files[file_id]
+
+    def run_batch(self, batch_id):
+        """Answer every request of a batch, then mark it completed"""
+        batch = self.batches[batch_id]
+        time.sleep(self.args.batch_delay)
+        batch['status'] = 'in_progress'
+        batch['in_progress_at'] = int(time.time())
+        outputs, errors = [], []
+        for line in self.files[batch['input_file_id']]['data'].decode('utf-8').splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            record = {'id': f"batch_req_{uuid.uuid4().hex[:24]}", 'custom_id': request.get('custom_id')}
+            if self.rng.random() < self.args.error_rate:
+                record['response'] = {'status_code': 500, 'body': {'error': {'message': 'Injected mock error'}}}
+                record['error'] = None
+                errors.append(record)
+                batch['request_counts']['failed'] += 1
+            else:
+                record['response'] = {'status_code': 200, 'body': self.completion(request.get('body', {}))}
+                record['error'] = None
+                outputs.append(record)
+                batch['request_counts']['completed'] += 1
+        if outputs:
+            batch['output_file_id'] = self.add_file(f"{batch_id}_output.jsonl", jsonl(outputs), 'batch_output')['id']
+        if errors:
+            batch['error_file_id'] = self.add_file(f"{batch_id}_error.jsonl", jsonl(errors), 'batch_output')['id']
+        batch['status'] = 'completed'
+        batch['completed_at'] = int(time.time())
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            latencies = sorted(self.latencies)
+        elapsed = time.monotonic() - self.started
+        stats['uptime_s'] = round(elapsed, 2)
+        stats['requests_per_second'] = round(stats['completed'] / elapsed, 2) if elapsed > 0 else 0.0
+        if latencies:
+            stats['latency_s'] = {
+                f"p{q}": round(latencies[min(len(latencies) - 1, int(len(latencies) * q / 100))], 4)
+                for q in (50, 95, 99)
+            }
+        return stats
+
+
+def jsonl(records):
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode('utf-8')
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def log_message(self, format, *args):
+        if self.state.args.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b''
+
+    def do_POST(self):
+        path = self.path.split('?')[0].rstrip('/')
+        body = self.read_body()
+        if path.endswith('/stats/reset'):
+            self.state.reset()
+            self.send_json(200, self.state.stats())
+        elif path.endswith('/chat/completions'):
+            self.chat_completion(json.loads(body or b'{}'))
+        elif path.endswith('/files'):
+            self.upload_file(body)
+        elif path.endswith('/batches'):
+            self.create_batch(json.loads(body or b'{}'))
+        elif re.search(r'/batches/[^/]+/cancel$', path):
+            batch = self.state.batches.get(path.split('/')[-2])
+            if batch is None:
+                return self.send_json(404, {'error': {'message': 'No such batch'}})
+            batch['status'] = 'cancelled'
+            self.send_json(200, batch)
+        else:
+            self.send_json(404, {'error': {'message': f'Unknown endpoint {path}'}})
+
+    def do_GET(self):
+        path = self.path.split('?')[0].rstrip('/')
+        if path.endswith('/stats'):
+            return self.send_json(200, self.state.stats())
+        match = re.search(r'/files/([^/]+)(/content)?$', path)
+        if match:
+            file = self.state.files.get(match.group(1))
+            if file is None:
+                return self.send_json(404, {'error': {'message': 'No such file'}})
+            if not match.group(2):
+                return self.send_json(200, {k: v for k, v in file.items() if k != 'data'})
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(file['data'])))
+            self.end_headers()
+            self.wfile.write(file['data'])
+            return
+        match = re.search(r'/batches/([^/]+)$', path)
+        if match and match.group(1) in self.state.batches:
+            return self.send_json(200, self.state.batches[match.group(1)])
+        self.send_json(404, {'error': {'message': f'Unknown endpoint {path}'}})
+
+    def chat_completion(self, body):
+        state = self.state
+        state.count('requests')
+        state.count('in_flight')
+        start = time.monotonic()
+        try:
+            time.sleep(state.latency.sample(count_images(body.get('messages', []))))
+            fault = state.fault()
+            if fault == 429:
+                state.count('rate_limited')
+                return self.send_json(429, {'error': {'message': 'Rate limit reached (mock)', 'type': 'rate_limit_error'}},
+                                      headers={'retry-after': str(state.args.retry_after)})
+            if fault == 500:
+                state.count('errors')
+                return self.send_json(500, {'error': {'message': 'Injected mock error', 'type': 'server_error'}})
+            response = state.completion(body)
+            state.count('completed')
+            self.send_json(200, response)
+        finally:
+            state.count('in_flight', -1)
+            with state.lock:
+                state.latencies.append(time.monotonic() - start)
+
+    def upload_file(self, body):
+        # multipart/form-data with a `file` part and a `purpose` field
+        message = email.parser.BytesParser().parsebytes(
+            b'Content-Type: ' + self.headers['Content-Type'].encode('latin-1') + b'\r\n\r\n' + body
+        )
+        filename, data, purpose = 'upload.jsonl', b'', 'batch'
+        for part in message.get_payload():
+            name = part.get_param('name', header='content-disposition')
+            if name == 'file':
+                filename = part.get_filename() or filename
+                data = part.get_payload(decode=True)
+            elif name == 'purpose':
+                purpose = part.get_payload(decode=True).decode('utf-8')
+        file = self.state.add_file(filename, data, purpose)
+        self.send_json(200, {k: v for k, v in file.items() if k != 'data'})
+
+    def create_batch(self, body):
+        state = self.state
+        input_file = state.files.get(body.get('input_file_id'))
+        if input_file is None:
+            return self.send_json(400, {'error': {'message': 'Unknown input_file_id'}})
+        total = sum(1 for line in input_file['data'].splitlines() if line.strip())
+        batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+        state.batches[batch_id] = {
+            'id': batch_id, 'object': 'batch', 'endpoint': body.get('endpoint', '/v1/chat/completions'),
+            'input_file_id': input_file['id'], 'completion_window': body.get('completion_window', '24h'),
+            'status': 'validating', 'created_at': int(time.time()), 'output_file_id': None, 'error_file_id': None,
+            'request_counts': {'total': total, 'completed': 0, 'failed': 0},
+        }
+        threading.Thread(target=state.run_batch, args=(batch_id,), daemon=True).start()
+        self.send_json(200, state.batches[batch_id])
+
+
+class MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Load tests open hundreds of connections at once
+    request_queue_size = 1024
+
+
+def make_server(args):
+    """Create the HTTP server; call serve_forever() on it, or run it in a thread"""
+    handler = type('Handler', (MockHandler,), {'state': MockState(args)})
+    return MockHTTPServer((args.host, args.port), handler)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Mock OpenAI-compatible server for offline load testing')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--latency', type=str, default='lognormal', choices=['fixed', 'uniform', 'exponential', 'lognormal'], help='Response latency distribution')
+    parser.add_argument('--latency_ms', type=float, default=500.0, help='Mean response latency (ms)')
+    parser.add_argument('--latency_sigma', type=float, default=0.5, help='Sigma of the lognormal latency distribution')
+    parser.add_argument('--per_image_ms', type=float, default=0.0, help='Extra latency (ms) per image in the request')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 500')
+    parser.add_argument('--rate_limit_rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 429')
+    parser.add_argument('--retry_after', type=float, default=1.0, help='Retry-After (s) sent with 429 responses')
+    parser.add_argument('--rpm', type=int, default=None, help='Answer with 429 beyond this many requests per minute')
+    parser.add_argument('--batch_delay', type=float, default=1.0, help='Seconds a batch stays validating before it is processed')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for latency and fault injection')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    server = make_server(args)
+    print(f"Mock server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.RequestHandlerClass.state.stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Client-side rate limiting for API-driven scripts.
+
+RateLimiter combines requests-per-minute and tokens-per-minute token buckets
+with an AIMD concurrency limit: the number of requests allowed in flight grows
+by one per window of healthy responses and is halved on 429 or 5xx errors, and
+a Retry-After header pauses all new requests until it has elapsed. It can be
+shared between threads and asyncio tasks.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+
+
+def error_status(error):
+    """Return the HTTP status code carried by an API exception, if any"""
+    status = getattr(error, 'status_code', None)
+    if status is None and getattr(error, 'response', None) is not None:
+        status = getattr(error.response, 'status_code', None)
+    return status
+
+
+def is_rate_limit_error(error):
+    return error_status(error) == 429 or type(error).__name__ == 'RateLimitError'
+
+
+def is_overload_error(error):
+    """True for errors that signal the backend is overloaded (5xx, timeouts, dropped connections)"""
+    status = error_status(error)
+    if status is not None:
+        return status >= 500
+    return type(error).__name__ in ('APIConnectionError', 'APITimeoutError', 'InternalServerError', 'TimeoutError')
+
+
+def retry_after_seconds(error):
+    """Return the Retry-After delay requested by the server, or None"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if value is not None:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return None
+
+
+def backoff_delay(error, default_delay):
+    """Delay before retrying after `error`, honouring Retry-After with a little jitter"""
+    delay = retry_after_seconds(error)
+    if delay is None:
+        delay = default_delay
+    return delay * random.uniform(1.0, 1.2)
+
+
+def estimate_tokens(messages, completion_tokens=512, image_tokens=765):
+    """Rough token count of a chat request, used to charge the tokens-per-minute bucket"""
+    chars = 0
+    images = 0
+    for message in messages:
+        content = message.get('content')
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for part in content or []:
+            if part.get('type') == 'text':
+                chars += len(part.get('text', ''))
+            elif part.get('type') == 'image_url':
+                images += 1
+    return chars // 4 + images * image_tokens + completion_tokens
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute up to `capacity`.
+
+    The default capacity allows a burst of ten seconds worth of traffic.
+    Reservations may drive the balance negative; the caller then waits until
+    the debt is repaid, which keeps requests in arrival order.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute / 6)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount, now):
+        """Take `amount` units and return how long to wait before using them"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class RateLimiter:
+    def __init__(self, rpm=None, tpm=None, max_concurrency=32, min_concurrency=1,
+                 adaptive=False, target_latency=None, decrease_factor=0.5):
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(min_concurrency, max_concurrency)
+        self.adaptive = adaptive
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        # Adaptive mode starts low and probes upwards, fixed mode uses the full budget
+        self.limit = float(max(self.min_concurrency, max_concurrency // 4) if adaptive else max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.min_latency = None
+        self.avg_latency = None
+        self.last_decrease = 0.0
+        self.rate_limited = 0
+        self.overloaded = 0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._async_waiters = deque()
+
+    # ----- acquiring a slot -----
+    def _try_take_slot(self):
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def _reserve(self, tokens):
+        now = time.monotonic()
+        delay = max(0.0, self.paused_until - now)
+        if self.request_bucket:
+            delay = max(delay, self.request_bucket.reserve(1, now))
+        if self.token_bucket and tokens:
+            delay = max(delay, self.token_bucket.reserve(tokens, now))
+        return delay
+
+    def acquire(self, tokens=0):
+        """Block until a request carrying `tokens` tokens may be sent"""
+        with self._cond:
+            while not self._try_take_slot():
+                self._cond.wait()
+            delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens=0):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._try_take_slot():
+                    delay = self._reserve(tokens)
+                    break
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+                    else:
+                        # Pass on the wake-up this waiter was given
+                        self._wake_waiters()
+                raise
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    # ----- reporting outcomes -----
+    def release(self, latency=None, error=None):
+        """Return a slot and adapt the concurrency limit to the outcome"""
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if error is not None and (is_rate_limit_error(error) or is_overload_error(error)):
+                if is_rate_limit_error(error):
+                    self.rate_limited += 1
+                    retry_after = retry_after_seconds(error)
+                    if retry_after:
+                        self.paused_until = max(self.paused_until, now + retry_after)
+                else:
+                    self.overloaded += 1
+                # At most one decrease per round trip (and per second), so a burst
+                # of failures from the same congested moment only halves the limit once
+                window = max(1.0, self.avg_latency or 0.0)
+                if self.adaptive and now - self.last_decrease > window:
+                    self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+                    self.last_decrease = now
+            elif error is None and latency is not None:
+                self.min_latency = latency if self.min_latency is None else min(self.min_latency, latency)
+                self.avg_latency = latency if self.avg_latency is None else 0.9 * self.avg_latency + 0.1 * latency
+                target = self.target_latency or 2 * self.min_latency
+                if self.adaptive and latency <= target:
+                    self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            self._wake_waiters()
+
+    def _wake_waiters(self):
+        free = int(self.limit) - self.in_flight
+        if free <= 0:
+            return
+        self._cond.notify(free)
+        while free > 0 and self._async_waiters:
+            loop, waiter = self._async_waiters.popleft()
+            loop.call_soon_threadsafe(_resolve, waiter)
+            free -= 1
+
+    @contextmanager
+    def limited(self, tokens=0):
+        """Hold a slot for the duration of one request"""
+        self.acquire(tokens)
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.release(error=e)
+            raise
+        else:
+            self.release(latency=time.monotonic() - start)
+
+    @asynccontextmanager
+    async def limited_async(self, tokens=0):
+        await self.acquire_async(tokens)
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            self.release(error=e if isinstance(e, Exception) else None)
+            raise
+        else:
+            self.release(latency=time.monotonic() - start)
+
+    def print_stats(self):
+        print(f"Rate limiter: concurrency limit {int(self.limit)}/{self.max_concurrency}, "
+              f"{self.rate_limited} rate-limited responses, {self.overloaded} overload errors")
+
+
+def _resolve(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def add_rate_limit_args(parser):
+    """Register the rate limiting command line options on an argparse parser"""
+    parser.add_argument('--rpm', type=float, default=None, help='Requests-per-minute limit (unlimited if not set)')
+    parser.add_argument('--tpm', type=float, default=None, help='Estimated tokens-per-minute limit (unlimited if not set)')
+    parser.add_argument('--adaptive_concurrency', action='store_true', help='Adjust concurrency with AIMD based on 429/5xx errors and latency')
+    parser.add_argument('--target_latency', type=float, default=None, help='Latency (s) below which adaptive concurrency grows (default: 2x fastest response)')
+
+
+def rate_limiter_from_args(args, max_concurrency):
+    return RateLimiter(
+        rpm=args.rpm,
+        tpm=args.tpm,
+        max_concurrency=max_concurrency,
+        adaptive=args.adaptive_concurrency,
+        target_latency=args.target_latency,
+    )
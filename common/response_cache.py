@@ -0,0 +1,198 @@
+"""
+Persistent on-disk cache of chat completion responses.
+
+Responses are stored in SQLite under a fingerprint of the model name, the
+messages (with inline images replaced by a hash of their content) and the
+sampling parameters, so re-running a script on unchanged requests costs no API
+calls. Entries expire after a TTL and the least recently used ones are evicted
+once the database exceeds its size budget. Access times of cache hits are
+written in batches rather than with a commit per hit.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+
+from common.rate_limit import estimate_tokens
+
+# Cache hits whose access time is written with one commit
+TOUCH_BATCH = 100
+
+
+def request_fingerprint(model, messages, **params):
+    """Hash a chat completion request into a stable cache key"""
+    def normalize(obj):
+        if isinstance(obj, dict):
+            if obj.get('type') == 'image_url':
+                url = obj['image_url']['url']
+                return {'type': 'image_url', 'sha256': hashlib.sha256(url.encode('utf-8')).hexdigest()}
+            return {k: normalize(v) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [normalize(v) for v in obj]
+        return obj
+
+    payload = json.dumps(
+        {'model': model, 'messages': normalize(messages), 'params': params},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path, ttl_seconds=None, max_bytes=None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> access time of hits not yet written to the database
+        self._touched = {}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL lets several processes share one cache file
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER, created REAL, accessed REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        """Return the cached response text, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, size, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._total_bytes -= row[1]
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= TOUCH_BATCH:
+                self._flush_touched()
+                self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def _flush_touched(self):
+        """Write the pending access times (the caller commits)"""
+        if self._touched:
+            self._conn.executemany("UPDATE responses SET accessed = ? WHERE key = ?",
+                                   [(accessed, key) for key, accessed in self._touched.items()])
+            self._touched.clear()
+
+    def put(self, key, model, response):
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._touched.pop(key, None)
+            if self.max_bytes is not None and self._total_bytes > self.max_bytes:
+                # Evict by up-to-date access times
+                self._flush_touched()
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones until under budget"""
+        if self.ttl_seconds is not None:
+            cur = self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,))
+            self.evictions += cur.rowcount
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        # Evict down to 90% of the budget so eviction does not run on every insert
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._total_bytes -= size
+            self.evictions += 1
+
+    def print_stats(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        print(f"Response cache: {self.hits} hits, {self.misses} misses ({hit_rate:.2%} hit rate), "
+              f"{self.evictions} evictions, {self._total_bytes / 1024 / 1024:.1f} MB in {self.path}")
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
+
+
+def cached_completion(client, cache, model, messages, rate_limiter=None, **params):
+    """Return the completion text for a request, from the cache when possible.
+
+    Only requests that reach the API go through the rate limiter.
+    """
+    key = None
+    if cache is not None:
+        key = request_fingerprint(model, messages, **params)
+        content = cache.get(key)
+        if content is not None:
+            return content
+    limited = rate_limiter.limited(estimate_tokens(messages)) if rate_limiter is not None else nullcontext()
+    with limited:
+        completion = client.chat.completions.create(model=model, messages=messages, **params)
+    content = completion.choices[0].message.content
+    if cache is not None and content is not None:
+        cache.put(key, model, content)
+    return content
+
+
+async def cached_completion_async(client, cache, model, messages, rate_limiter=None, **params):
+    """Async counterpart of cached_completion for AsyncOpenAI clients.
+
+    The SQLite lookups and writes run in a worker thread, off the event loop.
+    """
+    key = None
+    if cache is not None:
+        key = request_fingerprint(model, messages, **params)
+        content = await asyncio.to_thread(cache.get, key)
+        if content is not None:
+            return content
+    limited = rate_limiter.limited_async(estimate_tokens(messages)) if rate_limiter is not None else nullcontext()
+    async with limited:
+        completion = await client.chat.completions.create(model=model, messages=messages, **params)
+    content = completion.choices[0].message.content
+    if cache is not None and content is not None:
+        await asyncio.to_thread(cache.put, key, model, content)
+    return content
+
+
+def add_response_cache_args(parser):
+    """Register the response cache command line options on an argparse parser"""
+    parser.add_argument('--response_cache', type=str, default=None, help='SQLite file for caching model responses (disabled if not set)')
+    parser.add_argument('--cache_ttl_hours', type=float, default=None, help='Expire cached responses after this many hours')
+    parser.add_argument('--cache_max_mb', type=float, default=None, help='Evict least recently used responses beyond this size')
+
+
+def response_cache_from_args(args):
+    if not args.response_cache:
+        return None
+    return ResponseCache(
+        args.response_cache,
+        ttl_seconds=args.cache_ttl_hours * 3600 if args.cache_ttl_hours is not None else None,
+        max_bytes=int(args.cache_max_mb * 1024 * 1024) if args.cache_max_mb is not None else None,
+    )
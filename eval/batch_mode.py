@@ -0,0 +1,179 @@
+"""
+Offline evaluation through the provider's Batch API.
+
+`eval_model.py --mode batch` builds one chat completion request per pending
+item with the same message construction as the online engines, uploads them as
+batch input files (split by request count and size), submits the batches and
+polls them. Finished outputs are mapped back by custom_id (the item id) and
+written to eval_{model}.jsonl like online results; failed requests go to the
+dead-letter file.
+
+Submitted batches are recorded in eval_{model}_batch_state.json, so an
+interrupted run resumes polling instead of submitting the items again.
+"""
+
+import json
+import os
+import time
+
+from result_index import item_id
+
+TERMINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+
+def batch_state_path(eval_path):
+    return eval_path[:-len('.jsonl')] + '_batch_state.json'
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {'batches': []}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def build_chunks(run, data, indices, build_messages, image_base, max_requests, max_bytes):
+    """Yield (lines, items) chunks of batch input; items maps custom_id -> [idx, image resolutions].
+
+    indices hold one item per item id (see result_index.unique_indices), as custom_id must be unique.
+    """
+    lines, items, size = [], {}, 0
+    for idx in indices:
+        custom_id = item_id(data[idx]).hex()
+        messages, encoded_images = build_messages(data[idx], image_base)
+        line = json.dumps({
+            'custom_id': custom_id,
+            'method': 'POST',
+            'url': '/v1/chat/completions',
+            'body': {'model': run['model'], 'messages': messages},
+        }, ensure_ascii=False).encode('utf-8') + b'\n'
+        if lines and (len(lines) >= max_requests or size + len(line) > max_bytes):
+            yield lines, items
+            lines, items, size = [], {}, 0
+        lines.append(line)
+        items[custom_id] = [idx, [[image.width, image.height] for image in encoded_images]]
+        size += len(line)
+    if lines:
+        yield lines, items
+
+
+def submit_batches(client, run, data, indices, build_messages, image_base, state, state_path,
+                   max_requests=50000, max_bytes=190 * 1024 * 1024):
+    """Upload and submit batches for the given item indices, recording each in the state file"""
+    name = os.path.basename(run['eval_path'])[:-len('.jsonl')]
+    for lines, items in build_chunks(run, data, indices, build_messages, image_base, max_requests, max_bytes):
+        part = len(state['batches'])
+        input_file = client.files.create(file=(f"{name}_batch{part}.jsonl", b''.join(lines)), purpose='batch')
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint='/v1/chat/completions',
+            completion_window='24h',
+        )
+        state['batches'].append({'batch_id': batch.id, 'input_file_id': input_file.id, 'items': items, 'collected': False})
+        save_state(state_path, state)
+        print(f"[{run['model']}] Submitted batch {batch.id} with {len(items)} requests")
+
+
+def collect_batch(client, run, data, entry, batch):
+    """Write the results of a finished batch; return (completed, failed) counts"""
+    completed = failed = 0
+    seen = set()
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            custom_id = record.get('custom_id')
+            if custom_id not in entry['items'] or custom_id in seen:
+                continue
+            seen.add(custom_id)
+            idx, resolutions = entry['items'][custom_id]
+            response = record.get('response') or {}
+            body = response.get('body') or {}
+            if response.get('status_code') == 200 and body.get('choices'):
+                item = dict(data[idx])
+                item['assistant'] = body['choices'][0]['message']['content']
+                item['image_resolutions'] = resolutions
+                item['idx'] = idx
+                run['writer'].put(item)
+                run['stats'].add(item)
+                completed += 1
+            else:
+                error = record.get('error') or body.get('error') or {}
+                message = error.get('message') if isinstance(error, dict) else str(error)
+                fail_item(run, data, idx, entry['batch_id'], response.get('status_code'), message)
+                failed += 1
+
+    # Requests without any output line (e.g. an expired batch) are failures as well
+    for custom_id, (idx, _) in entry['items'].items():
+        if custom_id not in seen:
+            fail_item(run, data, idx, entry['batch_id'], None, f"no output, batch {batch.status}")
+            failed += 1
+    return completed, failed
+
+
+def fail_item(run, data, idx, batch_id, status, message):
+    run['stats'].add_failure()
+    run['dead_letters'].add(idx, data[idx], run['model'], [{
+        'attempt': 1,
+        'error_class': 'BatchRequestError',
+        'status': status,
+        'message': f"{message} (batch {batch_id})"[:500],
+        'elapsed_s': None,
+    }])
+
+
+def run_batch_mode(client, runs, data, build_messages, image_base, poll_interval=30.0,
+                   max_requests=50000, max_bytes=190 * 1024 * 1024):
+    """Submit, poll and collect batches for every model run"""
+    for run in runs:
+        run['batch_state_path'] = batch_state_path(run['eval_path'])
+        run['batch_state'] = state = load_state(run['batch_state_path'])
+        submitted = {
+            custom_id
+            for entry in state['batches'] if not entry['collected']
+            for custom_id in entry['items']
+        }
+        indices = sorted(idx for idx in run['pending'] if item_id(data[idx]).hex() not in submitted)
+        if submitted:
+            print(f"[{run['model']}] Resuming {len(submitted)} requests from earlier batches")
+        if indices:
+            submit_batches(client, run, data, indices, build_messages, image_base, state,
+                           run['batch_state_path'], max_requests, max_bytes)
+
+    while True:
+        waiting = 0
+        for run in runs:
+            state = run['batch_state']
+            for entry in state['batches']:
+                if entry['collected']:
+                    continue
+                batch = client.batches.retrieve(entry['batch_id'])
+                counts = batch.request_counts
+                if batch.status not in TERMINAL_STATUSES:
+                    waiting += 1
+                    if counts is not None:
+                        print(f"[{run['model']}] Batch {batch.id} {batch.status}: "
+                              f"{counts.completed}/{counts.total} completed, {counts.failed} failed")
+                    continue
+                completed, failed = collect_batch(client, run, data, entry, batch)
+                print(f"[{run['model']}] Batch {batch.id} {batch.status}: collected {completed} results, {failed} failed")
+                entry['collected'] = True
+                save_state(run['batch_state_path'], state)
+        if not waiting:
+            break
+        time.sleep(poll_interval)
+
+    for run in runs:
+        # Everything is collected, the next run starts from a clean state
+        if os.path.exists(run['batch_state_path']):
+            os.remove(run['batch_state_path'])
@@ -0,0 +1,92 @@
+"""
+Micro-benchmark of answer extraction on real model outputs.
+
+Times cal_score.extract_answer with the ordered regex list from
+get_answer_patterns() against AnswerExtractor, and checks
+that both give the same answer for every output.
+
+Usage:
+    python eval/bench_extract.py --result_dir ./result
+    python eval/bench_extract.py --files result/eval_gpt-4o.jsonl --repeat 5
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+
+from cal_score import AnswerExtractor, extract_answer, get_answer_patterns
+
+# Upper bounds (characters) of the output length buckets
+LENGTH_BUCKETS = [200, 1000, 4000, float('inf')]
+
+
+def load_outputs(paths):
+    outputs = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if item.get('assistant'):
+                    outputs.append(item['assistant'])
+    return outputs
+
+
+def time_extraction(outputs, answer_patterns, repeat):
+    """Best-of-`repeat` seconds to extract every output, and the answers"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        answers = [extract_answer(text, answer_patterns) for text in outputs]
+        best = min(best, time.perf_counter() - start)
+    return best, answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ordered-regex vs AnswerExtractor answer extraction')
+    parser.add_argument('--result_dir', type=str, default=None, help='Directory with eval_*.jsonl result files')
+    parser.add_argument('--files', type=str, nargs='*', default=[], help='Result files to read model outputs from')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed repetitions (best is reported)')
+    args = parser.parse_args()
+
+    paths = list(args.files)
+    if args.result_dir:
+        paths += sorted(glob.glob(os.path.join(args.result_dir, 'eval_*.jsonl')))
+    outputs = load_outputs(paths)
+    if not outputs:
+        parser.error('no model outputs found, pass --result_dir or --files')
+    print(f"{len(outputs)} model outputs from {len(paths)} files, "
+          f"mean length {sum(map(len, outputs)) / len(outputs):.0f} characters")
+
+    patterns, extractor = get_answer_patterns(), AnswerExtractor()
+    buckets = [('all', outputs)]
+    lower = 0
+    for upper in LENGTH_BUCKETS:
+        selected = [text for text in outputs if lower <= len(text) < upper]
+        if selected:
+            buckets.append((f"{lower}-{upper if upper != float('inf') else ''} chars", selected))
+        lower = upper
+
+    print(f"{'outputs':<18}{'count':>8}{'regex list us':>16}{'extractor us':>15}{'speedup':>10}")
+    mismatches = 0
+    for name, selected in buckets:
+        regex_s, regex_answers = time_extraction(selected, patterns, args.repeat)
+        single_s, single_answers = time_extraction(selected, extractor, args.repeat)
+        if name == 'all':
+            mismatches = sum(a != b for a, b in zip(regex_answers, single_answers))
+        print(f"{name:<18}{len(selected):>8}{regex_s / len(selected) * 1e6:>16.2f}"
+              f"{single_s / len(selected) * 1e6:>15.2f}{regex_s / single_s:>9.2f}x")
+
+    if mismatches:
+        print(f"Warning: {mismatches} outputs extracted differently")
+        return 1
+    print("Both extractors agree on every output")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,182 @@
+"""
+Accuracy breakdowns of scored results along configurable dimensions.
+
+One pass over the score detail file (compact or JSON) counts items and correct answers
+per cell, a cell being the combination of every dimension value of an item
+(task group, scene, question template, correct option letter, predicted
+letter). The cell counts are cached in eval_{model}_breakdown_cells.json and
+reused while the detail file is unchanged; any breakdown, including
+multi-key ones such as scene x label_letter, is a roll-up of the cells.
+
+The letter report compares how often the model answers each option letter
+with how often that letter is correct, flagging a bias toward e.g. "A".
+
+Usage:
+    python eval/breakdown.py --result_dir ./result --model gpt-4o
+    python eval/breakdown.py --result_dir ./result --model gpt-4o --by scene --by group,label_letter
+"""
+
+import argparse
+import json
+import os
+import re
+from collections import defaultdict
+
+from cal_score import CHOICE_LETTERS, GROUP_MAP
+from score_detail import result_columns
+
+# Words of the masked question that identify its template
+TEMPLATE_WORDS = 10
+
+
+def question_template(question):
+    """Template of a generated question: its opening words with image references and numbers masked"""
+    question = question.split('\nA.')[0]
+    question = re.sub(r'<image\d+>', '<image>', question)
+    question = re.sub(r'\d+', '#', question)
+    return ' '.join(question.split()[:TEMPLATE_WORDS])
+
+
+def choice_letter(value):
+    return value if isinstance(value, str) and value in CHOICE_LETTERS else None
+
+
+# name -> (result fields, function of those fields giving the dimension value)
+DIMENSIONS = {
+    'group': (('task_type',), lambda task_type: GROUP_MAP.get(task_type, task_type)),
+    'task_type': (('task_type',), lambda task_type: task_type),
+    'scene': (('scene',), lambda scene: scene),
+    'template': (('question',), question_template),
+    # Only multiple-choice items have a label / predicted letter
+    'label_letter': (('label',), choice_letter),
+    'pred_letter': (('label', 'pred'), lambda label, pred: choice_letter(pred) if choice_letter(label) else None),
+}
+FIELD_DEFAULTS = {'scene': 'unknown', 'question': ''}
+
+DEFAULT_BREAKDOWNS = [('group',), ('scene',), ('template',), ('label_letter',)]
+
+
+def count_cells(results, dimensions=tuple(DIMENSIONS)):
+    """{cell key tuple: [total, correct]} over all dimensions, in one pass over the result columns"""
+    needed = {field for name in dimensions for field in DIMENSIONS[name][0]}
+    columns = result_columns(results, sorted(needed) + ['is_correct'], FIELD_DEFAULTS)
+    values = [map(extract, *(columns[field] for field in fields)) for fields, extract in (DIMENSIONS[name] for name in dimensions)]
+    cells = defaultdict(lambda: [0, 0])
+    for key, is_correct in zip(zip(*values), columns['is_correct']):
+        cell = cells[key]
+        cell[0] += 1
+        cell[1] += bool(is_correct)
+    return dict(cells)
+
+
+def cells_cache_path(detail_path):
+    return os.path.splitext(detail_path)[0][:-len('_score_detail')] + '_breakdown_cells.json'
+
+
+def load_cells(detail_path, dimensions=tuple(DIMENSIONS)):
+    """Cell counts of a detail file, from the cache while the file is unchanged"""
+    from score_detail import load_detail_results
+    cache_path = cells_cache_path(detail_path)
+    stat = os.stat(detail_path)
+    source = {'size': stat.st_size, 'mtime': stat.st_mtime, 'dimensions': list(dimensions)}
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('source') == source:
+            return {tuple(row[:-2]): row[-2:] for row in cache['cells']}
+
+    cells = count_cells(load_detail_results(detail_path), dimensions)
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'source': source, 'cells': [list(key) + counts for key, counts in cells.items()]}, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+    return cells
+
+
+def rollup(cells, by, dimensions=tuple(DIMENSIONS)):
+    """{key tuple: [total, correct]} for the given dimensions; cells lacking one of them are skipped"""
+    positions = [dimensions.index(name) for name in by]
+    table = defaultdict(lambda: [0, 0])
+    for key, (total, correct) in cells.items():
+        projected = tuple(key[p] for p in positions)
+        if None in projected:
+            continue
+        row = table[projected]
+        row[0] += total
+        row[1] += correct
+    return dict(table)
+
+
+def letter_bias(cells, threshold=0.1, dimensions=tuple(DIMENSIONS)):
+    """Per option letter: share of labels, share of predictions, accuracy; and the letters over-predicted by > threshold"""
+    labels = rollup(cells, ('label_letter',), dimensions)
+    preds = rollup(cells, ('pred_letter',), dimensions)
+    n_choice = sum(total for total, _ in labels.values())
+    rows, biased = [], []
+    for letter in CHOICE_LETTERS:
+        label_total, label_correct = labels.get((letter,), (0, 0))
+        pred_total = preds.get((letter,), (0, 0))[0]
+        row = {
+            'letter': letter,
+            'label_share': label_total / n_choice if n_choice else 0.0,
+            'pred_share': pred_total / n_choice if n_choice else 0.0,
+            'accuracy': label_correct / label_total if label_total else None,
+        }
+        rows.append(row)
+        if row['pred_share'] - row['label_share'] > threshold:
+            biased.append(letter)
+    return rows, biased
+
+
+def print_breakdown(cells, by, min_items=1, dimensions=tuple(DIMENSIONS)):
+    table = rollup(cells, by, dimensions)
+    print(f"\nAccuracy by {' x '.join(by)}:")
+    for key, (total, correct) in sorted(table.items(), key=lambda kv: (-kv[1][1] / kv[1][0], kv[0])):
+        if total >= min_items:
+            print(f"  {' | '.join(map(str, key)):<70}{correct:>6}/{total:<6}{correct / total:8.2%}")
+
+
+def print_letter_bias(cells, threshold=0.1, dimensions=tuple(DIMENSIONS), show_table=True):
+    rows, biased = letter_bias(cells, threshold, dimensions)
+    if show_table:
+        print("\nOption letters (multiple-choice items):")
+        for row in rows:
+            accuracy = f"{row['accuracy']:8.2%}" if row['accuracy'] is not None else '       -'
+            print(f"  {row['letter']}: correct answer {row['label_share']:7.2%}, predicted {row['pred_share']:7.2%}, accuracy {accuracy}")
+    for letter in biased:
+        print(f"Warning: Predicts {letter} far more often than it is the correct answer")
+    return biased
+
+
+def parse_breakdown(spec):
+    by = tuple(name.strip() for name in spec.split(',') if name.strip())
+    unknown = [name for name in by if name not in DIMENSIONS]
+    if unknown or not by:
+        raise argparse.ArgumentTypeError(f"unknown dimension(s) {unknown}, choose from {list(DIMENSIONS)}")
+    return by
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Accuracy breakdowns of scored results')
+    parser.add_argument('--result_dir', type=str, required=True, help='Result directory')
+    parser.add_argument('--model', type=str, required=True, help='Model name')
+    parser.add_argument('--by', type=parse_breakdown, action='append', default=None,
+                        help=f"Comma-separated dimensions of one breakdown (repeatable), from {', '.join(DIMENSIONS)}")
+    parser.add_argument('--min_items', type=int, default=1, help='Hide breakdown rows with fewer items')
+    parser.add_argument('--bias_threshold', type=float, default=0.1, help='Flag letters predicted this much more often than they are correct')
+    args = parser.parse_args()
+
+    from score_detail import find_detail_path
+    detail_path = find_detail_path(args.result_dir, args.model)
+    if detail_path is None:
+        print(f"Error: No score detail file for {args.model} in {args.result_dir}, run cal_score.py first")
+        return 1
+    cells = load_cells(detail_path)
+    for by in args.by or DEFAULT_BREAKDOWNS:
+        print_breakdown(cells, by, args.min_items)
+    print_letter_bias(cells, args.bias_threshold)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
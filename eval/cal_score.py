@@ -1,18 +1,25 @@
 import json
 import re
+import sys
+import time
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import argparse
 import os
-import pandas as pd
 from datetime import datetime
 from pathlib import Path
 
 def extract_answer(text, answer_patterns):
-    """Try to extract answer using multiple patterns"""
-    for pattern in answer_patterns:
-        match = pattern.search(text)
-        if match:
-            return match.group(1).strip()
+    """Try to extract answer using multiple patterns (a list of regexes or an AnswerExtractor)"""
+    if isinstance(answer_patterns, AnswerExtractor):
+        answer = answer_patterns.search(text)
+        if answer is not None:
+            return answer
+    else:
+        for pattern in answer_patterns:
+            match = pattern.search(text)
+            if match:
+                return match.group(1).strip()
     
     # Fallback: If no pattern matches, try to extract short answer from last line
     lines = text.strip().split('\n')
@@ -60,37 +67,34 @@ def normalize_answer(ans):
         return ans.upper()
     return str(ans)
 
+# Task group -> leaderboard column
+TASK_COLUMNS = {
+    'Quantitative': 'Quantitative',
+    'Procedural_intermediate_state_recognition': 'Procedural (intermediate state recognition)',
+    'Procedural_latent_action_reasoning': 'Procedural (latent action reasoning)',
+    'Procedural_transformation_planning': 'Procedural (transformation planning)',
+    'Spatial_fine_grained': 'Spatial (fine-grained)',
+    'Spatial_global': 'Spatial (global)'
+}
+
+def build_result_row(model, new_task_groups, total, correct):
+    """Leaderboard row of a model: overall and per task group accuracy (None for empty groups)"""
+    row = {'Model': model, 'Overall': correct / total if total > 0 else 0.0}
+    for group_name, column in TASK_COLUMNS.items():
+        stats = new_task_groups.get(group_name)
+        row[column] = stats['correct'] / stats['total'] if stats and stats['total'] > 0 else None
+    row['Timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return row
+
+def format_result_row(row):
+    """Accuracies as percentage strings, the format of result.xlsx"""
+    return {key: f"{value:.2%}" if isinstance(value, float) else ('' if value is None else value)
+            for key, value in row.items()}
+
 def save_to_excel(model, new_task_groups, total, correct, excel_path):
     """Save results to Excel file"""
-    overall_acc = correct / total if total > 0 else 0
-    
-    # Prepare row data
-    row_data = {
-        'Model': model,
-        'Overall': f"{overall_acc:.2%}",
-        'Quantitative': '',
-        'Procedural (intermediate state recognition)': '',  
-        'Procedural (latent action reasoning)': '',   
-        'Procedural (transformation planning)': '',    
-        'Spatial (fine-grained)': '',            
-        'Spatial (global)': '',                    
-        'Timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
-    
-    # Fill task accuracies
-    task_mapping = {
-        'Quantitative': 'Quantitative',
-        'Procedural_intermediate_state_recognition': 'Procedural (intermediate state recognition)',
-        'Procedural_latent_action_reasoning': 'Procedural (latent action reasoning)',
-        'Procedural_transformation_planning': 'Procedural (transformation planning)',
-        'Spatial_fine_grained': 'Spatial (fine-grained)',
-        'Spatial_global': 'Spatial (global)'
-    }
-    
-    for group_name, stats in new_task_groups.items():
-        if group_name in task_mapping and stats['total'] > 0:
-            acc = stats['correct'] / stats['total']
-            row_data[task_mapping[group_name]] = f"{acc:.2%}"
+    import pandas as pd
+    row_data = format_result_row(build_result_row(model, new_task_groups, total, correct))
     
     # Load or create DataFrame
     try:
@@ -132,6 +136,65 @@ def get_answer_patterns():
         re.compile(r"\*\*Final answer\*\*:\s*<start bbox>\s*(.*?)\s*</start bbox>", re.IGNORECASE | re.DOTALL)
     ]
 
+class AnswerExtractor:
+    """Faster equivalent of trying get_answer_patterns() in order.
+
+    The text is case-folded once and the answer markers are located with
+    str.find in pattern order, stopping at the first marker that yields an
+    answer; the regexes rescan the whole text for every pattern that misses.
+    Non-ASCII text is searched as UTF-8 bytes: bytes.lower() only folds ASCII
+    letters, which is all the (ASCII) markers need, and is much cheaper than
+    str.lower() on wide strings. The combined "**Final answer**:
+    <|begin_of_box|>" and "**Final answer**: <start bbox>" patterns are left
+    out: whatever they match, an earlier pattern matches too.
+    """
+    # (opening marker, closing marker or None to take the rest of the text), in pattern order
+    MARKERS = [
+        ('<answer>', '</answer>'),
+        ('<|begin_of_box|>', '<|end_of_box|>'),
+        ('**final answer**:', None),
+        ('final answer:', None),
+        ('final anser:', None),
+        ('<start bbox>', '</start bbox>'),
+    ]
+    BYTE_MARKERS = [(opener.encode(), closer and closer.encode()) for opener, closer in MARKERS]
+    # Non-ASCII letters that re.IGNORECASE matches to a marker letter
+    FOLD = [('İ', 'i'), ('ı', 'i'), ('ſ', 's'), ('K', 'k')]
+
+    def __init__(self):
+        self.patterns = get_answer_patterns()
+
+    def search(self, text):
+        """Answer of the highest-priority marker found in text, or None"""
+        if text.isascii():
+            answer = self.find(text, text.lower(), self.MARKERS)
+        elif any(letter in text for letter, _ in self.FOLD):
+            folded = text
+            for letter, ascii_letter in self.FOLD:
+                folded = folded.replace(letter, ascii_letter)
+            answer = self.find(text, folded.lower(), self.MARKERS)
+        else:
+            raw = text.encode('utf-8', 'surrogatepass')
+            answer = self.find(raw, raw.lower(), self.BYTE_MARKERS)
+            # The markers are ASCII, so the slice never splits a UTF-8 sequence
+            answer = answer.decode('utf-8', 'surrogatepass') if answer is not None else None
+        return answer.strip() if answer is not None else None
+
+    @staticmethod
+    def find(text, lowered, markers):
+        """Unstripped answer of the first marker found in lowered (same length as text)"""
+        for opener, closer in markers:
+            start = lowered.find(opener)
+            if start < 0:
+                continue
+            start += len(opener)
+            if closer is None:
+                return text[start:]
+            end = lowered.find(closer, start)
+            if end >= 0:
+                return text[start:end]
+        return None
+
 def initialize_stats():
     """Initialize statistics dictionaries"""
     task_type_stats = defaultdict(lambda: {'total': 0, 'correct': 0})
@@ -145,34 +208,30 @@ def initialize_stats():
     }
     return task_type_stats, new_task_groups
 
-def process_item(item, answer_patterns, item_idx):
-    """Process a single evaluation item"""
-    task_type = item.get('task_type', 'unknown')
-    label= item.get('label', '')
-    assistant = item.get('assistant', '')
-    
+def score_answer(answer, task_type, label):
+    """Score an extracted answer; returns (label, pred, is_correct)"""
     # Determine question type (classification/counting/object list)
     if task_type in ['count']:
         # Counting questions: numeric answer
-        try:
-            pred = extract_answer(assistant, answer_patterns)
-
-            is_correct = (pred == label)
-        except:
-            is_correct = False
-        pred = str(pred) if pred is not None else ''
+        is_correct = (answer == label)
+        pred = str(answer) if answer is not None else ''
+    # Check if it's a multi-choice question (A, B, C, D)
+    elif isinstance(label, str) and label.upper() in ['A', 'B', 'C', 'D']:
+        # Multiple choice question
+        label = label.upper()
+        pred = normalize_answer(answer)
+        is_correct = (pred == label)
     else:
-        # Check if it's a multi-choice question (A, B, C, D)
-        if isinstance(label, str) and label.upper() in ['A', 'B', 'C', 'D']:
-            # Multiple choice question
-            label = label.upper()
-            pred = normalize_answer(extract_answer(assistant, answer_patterns))
-            is_correct = (pred == label)
-        else:
+        pred_objects = extract_objects_from_text(answer)
+        pred = ', '.join(pred_objects) if pred_objects else ''
+        is_correct = compare_objects(pred_objects, label)
+    return label, pred, is_correct
 
-            pred_objects = extract_objects_from_text(extract_answer(assistant, answer_patterns))
-            pred = ', '.join(pred_objects) if pred_objects else ''
-            is_correct = compare_objects(pred_objects, label)
+def process_item(item, answer_patterns, item_idx):
+    """Process a single evaluation item"""
+    task_type = item.get('task_type', 'unknown')
+    assistant = item.get('assistant', '')
+    label, pred, is_correct = score_answer(extract_answer(assistant, answer_patterns), task_type, item.get('label', ''))
     
     return {
         'idx': item_idx,
@@ -194,75 +253,319 @@ def print_statistics(total, correct, new_task_groups):
             acc = stat['correct'] / stat['total']
             print(f"{group_name}: {stat['correct']}/{stat['total']} ({acc:.2%})")
 
+# Task type -> reported task group
+GROUP_MAP = {
+    'count': 'Quantitative',
+    'procedural_interm': 'Procedural_intermediate_state_recognition',
+    'procedural_causal': 'Procedural_latent_action_reasoning',
+    'procedural_plan': 'Procedural_transformation_planning',
+    'spatial_fine_grained': 'Spatial_fine_grained',
+    'spatial_global': 'Spatial_global'
+}
+
+class IncrementalScorer:
+    """Scores an eval JSONL file from a byte offset onwards, keeping running counters.
+
+    update() only reads complete lines appended since the last call, so it can
+    tail a file eval_model.py is still writing. The offset and counters can be
+    saved to a checkpoint file and restored by a later process.
+    """
+
+    def __init__(self, eval_path, answer_patterns, checkpoint_path=None, keep_results=True):
+        self.eval_path = str(eval_path)
+        self.answer_patterns = answer_patterns
+        self.checkpoint_path = str(checkpoint_path) if checkpoint_path else None
+        self.keep_results = keep_results
+        self.results = []
+        self.reset()
+        if self.checkpoint_path:
+            self.load_checkpoint()
+        # Results before this offset were scored by an earlier process
+        self.start_offset = self.offset
+
+    def reset(self):
+        self.offset = 0
+        self.total = self.correct = 0
+        _, self.new_task_groups = initialize_stats()
+        self.results = []
+
+    def _file_id(self):
+        stat = os.stat(self.eval_path)
+        return stat.st_ino, stat.st_size
+
+    def load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        inode, size = self._file_id() if os.path.exists(self.eval_path) else (None, 0)
+        # A replaced or truncated eval file invalidates the checkpoint
+        if state.get('inode') != inode or state.get('offset', 0) > size:
+            print(f"Checkpoint {self.checkpoint_path} does not match {self.eval_path}, scoring from the start")
+            return
+        self.offset = state['offset']
+        self.total = state['total']
+        self.correct = state['correct']
+        self.new_task_groups.update(state['new_task_groups'])
+
+    def save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        state = {
+            'eval_path': self.eval_path,
+            'inode': self._file_id()[0],
+            'offset': self.offset,
+            'total': self.total,
+            'correct': self.correct,
+            'new_task_groups': self.new_task_groups,
+        }
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def add(self, item):
+        """Score one result and update the counters"""
+        self.total += 1
+        result = process_item(item, self.answer_patterns, self.total)
+        if result['is_correct']:
+            self.correct += 1
+        group = GROUP_MAP.get(result['task_type'])
+        if group:
+            self.new_task_groups[group]['total'] += 1
+            if result['is_correct']:
+                self.new_task_groups[group]['correct'] += 1
+        if self.keep_results:
+            self.results.append(result)
+        return result
+
+    def update(self, at_eof=False):
+        """Score complete lines appended since the last call; return how many were scored.
+
+        A last line without a newline is held back, as the writer may be halfway
+        through it. With at_eof the file is finished, and such a line is scored
+        if it is valid JSON.
+        """
+        if not os.path.exists(self.eval_path):
+            return 0
+        if os.path.getsize(self.eval_path) < self.offset:
+            print(f"{self.eval_path} shrank, scoring from the start")
+            self.reset()
+        scored = 0
+        with open(self.eval_path, 'rb') as f:
+            f.seek(self.offset)
+            for line in f:
+                complete = line.endswith(b'\n')
+                if not line.strip():
+                    self.offset += len(line) if complete else 0
+                    continue
+                if complete:
+                    item = json.loads(line)
+                elif not at_eof:
+                    break
+                else:
+                    try:
+                        item = json.loads(line)
+                    except json.JSONDecodeError:
+                        print(f"Skipping the incomplete last line of {self.eval_path}")
+                        break
+                self.offset += len(line)
+                self.add(item)
+                scored += 1
+        return scored
+
 def process_evaluation_file(eval_path, answer_patterns):
     """Process evaluation file and return results and statistics"""
-    new_task_groups = {
-        'Quantitative': {'total': 0, 'correct': 0},
-        'Procedural_intermediate_state_recognition': {'total': 0, 'correct': 0},
-        'Procedural_latent_action_reasoning': {'total': 0, 'correct': 0},
-        'Procedural_transformation_planning': {'total': 0, 'correct': 0},
-        'Spatial_fine_grained': {'total': 0, 'correct': 0},
-        'Spatial_global': {'total': 0, 'correct': 0}
-    }
-    
-    results = []
-    total = correct = 0
-    
-    with open(eval_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            item = json.loads(line.strip())
-            total += 1
-            
-            result = process_item(item, answer_patterns, total)
-            if result['is_correct']:
-                correct += 1
-            
-            # Update new task groups statistics  
-            task_type = result['task_type']
-            group_map = {
-                'count': 'Quantitative',
-                'procedural_interm': 'Procedural_intermediate_state_recognition',
-                'procedural_causal': 'Procedural_latent_action_reasoning', 
-                'procedural_plan': 'Procedural_transformation_planning',
-                'spatial_fine_grained': 'Spatial_fine_grained',
-                'spatial_global': 'Spatial_global'
-            }
-            
-            if task_type in group_map:
-                group = group_map[task_type]
-                new_task_groups[group]['total'] += 1
-                if result['is_correct']:
-                    new_task_groups[group]['correct'] += 1
-            
-            results.append(result)
-    
-    return results, total, correct, new_task_groups
+    scorer = IncrementalScorer(eval_path, answer_patterns)
+    scorer.update(at_eof=True)
+    return scorer.results, scorer.total, scorer.correct, scorer.new_task_groups
+
+CHOICE_LETTERS = ['A', 'B', 'C', 'D']
+
+def eval_run_finished(summary_path, since):
+    """eval_model.py writes its run summary last, once every result is on disk"""
+    return os.path.exists(summary_path) and os.path.getmtime(summary_path) >= since
+
+def follow_evaluation_file(scorer, summary_path, interval=5.0, idle_exit=None):
+    """Tail the eval file, refreshing the accuracy table until the run finishes or Ctrl-C"""
+    started = last_new = time.time()
+    rate_start, rate_total = time.monotonic(), scorer.total
+    try:
+        while True:
+            new = scorer.update()
+            now = time.time()
+            if new:
+                last_new = now
+                scorer.save_checkpoint()
+                if sys.stdout.isatty():
+                    print("\033[H\033[J", end="")
+                elapsed = time.monotonic() - rate_start
+                print(f"[{time.strftime('%H:%M:%S')}] {scorer.eval_path}: +{new} results, "
+                      f"{(scorer.total - rate_total) / elapsed if elapsed > 0 else 0.0:.1f} results/s")
+                if scorer.total:
+                    print_statistics(scorer.total, scorer.correct, scorer.new_task_groups)
+            elif eval_run_finished(summary_path, started):
+                print("Evaluation run finished")
+                break
+            elif idle_exit is not None and now - last_new >= idle_exit:
+                print(f"No new results for {idle_exit:.0f}s, stopping")
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("Stopped following")
+    scorer.save_checkpoint()
+
+# ========== Leaderboard ==========
+def discover_models(result_dir):
+    """Models with an eval_{model}.jsonl in result_dir (shard files live in shards/ and are skipped)"""
+    return sorted(path.name[len('eval_'):-len('.jsonl')] for path in Path(result_dir).glob('eval_*.jsonl'))
+
+def save_details(results, result_dir, model, detail_format='compact'):
+    """Write the per-item results as a compact binary file (see score_detail.py) or indented JSON"""
+    from score_detail import detail_path, write_score_detail
+    path = detail_path(str(result_dir), model, detail_format)
+    if detail_format == 'compact':
+        write_score_detail(path, results)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return path
+
+def score_model(result_dir, model, detail_format='compact'):
+    """Score one model and save its detail file; runs in a worker process under --all"""
+    result_dir = Path(result_dir)
+    eval_path = result_dir / f"eval_{model}.jsonl"
+    results, total, correct, new_task_groups = process_evaluation_file(str(eval_path), AnswerExtractor())
+    save_details(results, result_dir, model, detail_format)
+    return model, total, correct, new_task_groups
+
+def write_leaderboard(rows, result_dir, fmt='csv'):
+    """Write the leaderboard (one row per model, best first) as CSV or Parquet; returns the DataFrame"""
+    import pandas as pd
+    df = pd.DataFrame(rows).sort_values('Overall', ascending=False, ignore_index=True)
+    path = Path(result_dir) / f"leaderboard.{fmt}"
+    if fmt == 'parquet':
+        try:
+            df.to_parquet(path, index=False)
+        except ImportError as e:
+            print(f"Warning: Failed to write Parquet ({e}), writing CSV instead")
+            path = path.with_suffix('.csv')
+            df.to_csv(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    print(f"Leaderboard saved to: {path}")
+    return df
+
+def export_leaderboard_excel(df, excel_path):
+    """Write result.xlsx once, keeping rows of models that were not scored in this run"""
+    import pandas as pd
+    rows = [format_result_row(row) for row in df.drop(columns=['Total', 'Correct']).to_dict('records')]
+    try:
+        board = pd.DataFrame(rows)
+        if os.path.exists(excel_path):
+            existing = pd.read_excel(excel_path)
+            board = pd.concat([board, existing[~existing['Model'].isin(board['Model'])]], ignore_index=True)
+        board.to_excel(excel_path, index=False)
+        print(f"Results saved to Excel: {excel_path}")
+    except Exception as e:
+        print(f"Warning: Failed to save Excel file: {e}")
+
+def score_all(result_dir, workers=None, fmt='csv', excel=False, detail_format='compact'):
+    """Score every model in result_dir in a process pool and build the leaderboard once"""
+    models = discover_models(result_dir)
+    if not models:
+        print(f"Error: No eval_*.jsonl files found in {result_dir}")
+        return 1
+    workers = min(workers or os.cpu_count() or 1, len(models))
+    print(f"Scoring {len(models)} models with {workers} worker processes")
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(score_model, str(result_dir), model, detail_format): model for model in models}
+        for future in as_completed(futures):
+            try:
+                model, total, correct, new_task_groups = future.result()
+            except Exception as e:
+                print(f"Warning: Failed to score {futures[future]}: {e}")
+                continue
+            print(f"{model}: {correct}/{total} ({correct / total if total > 0 else 0:.2%})")
+            rows.append({**build_result_row(model, new_task_groups, total, correct), 'Total': total, 'Correct': correct})
+    if not rows:
+        return 1
+
+    df = write_leaderboard(rows, result_dir, fmt)
+    print(df[['Model', 'Overall', 'Total']].to_string(index=False, formatters={'Overall': lambda x: f"{x:.2%}"}))
+    if excel:
+        export_leaderboard_excel(df, str(Path(result_dir) / "result.xlsx"))
+    return 0
 
 def main():
     parser = argparse.ArgumentParser(description='Calculate evaluation scores')
-    parser.add_argument('--model', type=str, required=True, help='Model name')
+    parser.add_argument('--model', type=str, default=None, help='Model name')
     parser.add_argument('--result_dir', type=str, required=True, help='Result directory')
+    parser.add_argument('--all', action='store_true', help='Score every eval_*.jsonl in result_dir and build the leaderboard')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for --all (default: CPU count)')
+    parser.add_argument('--leaderboard_format', type=str, default='csv', choices=['csv', 'parquet'], help='File format of the --all leaderboard')
+    parser.add_argument('--excel', action='store_true', help='With --all, also export the leaderboard to result.xlsx')
+    parser.add_argument('--no_excel', action='store_true', help='Do not update result.xlsx (skips loading pandas, e.g. when scoring many runs in a loop)')
+    parser.add_argument('--detail_format', type=str, default='compact', choices=['compact', 'json'], help='Per-item detail file: compact binary (.bin + shared score_questions.jsonl) or indented JSON')
+    parser.add_argument('--breakdown', action='store_true', help='Print accuracy by task group, scene, question template and option letter')
+    parser.add_argument('--bootstrap', type=int, default=0, help='Print bootstrap confidence intervals of the accuracies from this many resamples')
+    parser.add_argument('--follow', action='store_true', help='Tail the eval file while eval_model.py is still writing it and refresh the accuracy table')
+    parser.add_argument('--interval', type=float, default=5.0, help='Seconds between checks for new results in --follow mode')
+    parser.add_argument('--idle_exit', type=float, default=None, help='Stop following after this many seconds without new results')
     args = parser.parse_args()
+    if args.all:
+        if args.follow:
+            parser.error('--follow scores a single model, it cannot be combined with --all')
+        return score_all(args.result_dir, args.workers, args.leaderboard_format, args.excel, args.detail_format)
+    if not args.model:
+        parser.error('--model is required unless --all is given')
 
     result_dir = Path(args.result_dir)
     eval_path = result_dir / f"eval_{args.model}.jsonl"
-    detail_path = result_dir / f"eval_{args.model}_score_detail.json"
+    checkpoint_path = result_dir / f"eval_{args.model}_score_checkpoint.json"
+    summary_path = result_dir / f"eval_{args.model}_summary.json"
     excel_path = result_dir / "result.xlsx"
     
-    if not eval_path.exists():
+    if not eval_path.exists() and not args.follow:
         print(f"Error: Evaluation file not found: {eval_path}")
         return 1
 
-    answer_patterns = get_answer_patterns()
-    results, total, correct, new_task_groups = process_evaluation_file(str(eval_path), answer_patterns)
+    answer_patterns = AnswerExtractor()
+    if args.follow:
+        scorer = IncrementalScorer(eval_path, answer_patterns, checkpoint_path=checkpoint_path)
+        if scorer.start_offset:
+            print(f"Resuming from checkpoint: {scorer.total} results already scored")
+        follow_evaluation_file(scorer, str(summary_path), args.interval, args.idle_exit)
+        if not scorer.total:
+            print("No results scored")
+            return 1
+        if scorer.start_offset:
+            # Per-item details of the results scored before the checkpoint are not kept
+            scorer = IncrementalScorer(eval_path, answer_patterns)
+            scorer.update()
+        results, total, correct, new_task_groups = scorer.results, scorer.total, scorer.correct, scorer.new_task_groups
+    else:
+        results, total, correct, new_task_groups = process_evaluation_file(str(eval_path), answer_patterns)
     print_statistics(total, correct, new_task_groups)
+    if total:
+        # Always warn about a model that favours one option letter; --breakdown prints the tables
+        from breakdown import DEFAULT_BREAKDOWNS, count_cells, print_breakdown, print_letter_bias
+        cells = count_cells(results)
+        if args.breakdown:
+            for by in DEFAULT_BREAKDOWNS:
+                print_breakdown(cells, by)
+        print_letter_bias(cells, show_table=args.breakdown)
+    if args.bootstrap and total:
+        from significance import print_intervals, result_intervals
+        print_intervals(args.model, result_intervals(results, args.bootstrap))
 
     result_dir.mkdir(parents=True, exist_ok=True)
-    with open(detail_path, 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
-    print(f"Detailed results saved to: {detail_path}")
+    print(f"Detailed results saved to: {save_details(results, result_dir, args.model, args.detail_format)}")
     
-    save_to_excel(args.model, new_task_groups, total, correct, str(excel_path))
+    if not args.no_excel:
+        save_to_excel(args.model, new_task_groups, total, correct, str(excel_path))
     return 0
 
 if __name__ == '__main__':
@@ -0,0 +1,105 @@
+"""
+Circuit breaker that pauses request dispatch while the backend is failing.
+
+Outcomes of recent requests are kept in a sliding window. Once enough of them
+are overload errors (5xx, connection errors, timeouts) the breaker opens and
+every worker waits out a cooldown instead of hammering the backend. After the
+cooldown a single probe request is let through: success closes the breaker,
+another overload error opens it again.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+
+from common.rate_limit import is_overload_error
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self, error_rate=0.5, min_requests=20, window=50, cooldown=30.0):
+        self.error_rate = error_rate
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.times_opened = 0
+        self.open_seconds = 0.0
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def _admit(self, now):
+        """Return 0 if a request may be sent now, otherwise how long to wait"""
+        with self._lock:
+            if self.state == CLOSED:
+                return 0
+            if self.state == OPEN:
+                reopen = self.opened_at + self.cooldown
+                if now < reopen:
+                    return reopen - now
+                self.state = HALF_OPEN
+                self.probing = False
+            if not self.probing:
+                self.probing = True
+                return 0
+            # A probe is in flight, check back shortly
+            return min(1.0, self.cooldown)
+
+    def wait(self):
+        """Block until the breaker lets a request through"""
+        while True:
+            delay = self._admit(time.monotonic())
+            if not delay:
+                return
+            time.sleep(delay)
+
+    async def wait_async(self):
+        while True:
+            delay = self._admit(time.monotonic())
+            if not delay:
+                return
+            await asyncio.sleep(delay)
+
+    def record(self, error=None):
+        """Record the outcome of one request"""
+        failure = error is not None and is_overload_error(error)
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if failure:
+                    self._open(now)
+                else:
+                    self.state = CLOSED
+                    self.open_seconds += now - self.opened_at
+                    self._outcomes.clear()
+                    print("Circuit breaker closed, backend recovered")
+                return
+            if self.state == OPEN:
+                # Requests sent before the breaker opened, nothing new to learn
+                return
+            self._outcomes.append(failure)
+            if len(self._outcomes) >= self.min_requests and sum(self._outcomes) / len(self._outcomes) >= self.error_rate:
+                self._open(now)
+
+    def _open(self, now):
+        if self.state == HALF_OPEN:
+            self.open_seconds += now - self.opened_at
+        self.state = OPEN
+        self.opened_at = now
+        self.probing = False
+        self.times_opened += 1
+        print(f"Circuit breaker opened, pausing requests for {self.cooldown:.0f} seconds")
+
+    def stats(self):
+        with self._lock:
+            open_seconds = self.open_seconds
+            if self.state != CLOSED:
+                open_seconds += time.monotonic() - self.opened_at
+            return {'state': self.state, 'times_opened': self.times_opened, 'open_seconds': round(open_seconds, 2)}
+
+    def print_stats(self):
+        s = self.stats()
+        print(f"Circuit breaker: opened {s['times_opened']} times, {s['open_seconds']:.1f}s paused, now {s['state']}")
@@ -0,0 +1,90 @@
+"""
+Dead-letter file for items that could not be evaluated.
+
+Items that fail all their attempts are appended to dead_letter_{model}.jsonl
+next to the result file, with the class of the final error and the history of
+every failed attempt. `eval_model.py --retry_dead_letters` replays only these
+items; at the end of each run the file is rewritten without the items that
+have since been evaluated.
+"""
+
+import json
+import os
+import threading
+import time
+
+from result_index import item_id
+
+
+def dead_letter_path(eval_path):
+    """eval_{model}.jsonl -> dead_letter_{model}.jsonl in the same directory"""
+    directory, name = os.path.split(eval_path)
+    return os.path.join(directory, "dead_letter_" + name[len("eval_"):])
+
+
+def attempt_record(attempt, error, started):
+    status = getattr(error, 'status_code', None)
+    return {
+        'attempt': attempt,
+        'error_class': type(error).__name__,
+        'status': status,
+        'message': str(error)[:500],
+        'elapsed_s': round(time.monotonic() - started, 3),
+    }
+
+
+class DeadLetterLog:
+    def __init__(self, path):
+        self.path = path
+        # item id (hex) -> latest dead-letter record
+        self.records = {}
+        self.added = 0
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.records[record['item_id']] = record
+
+    def __contains__(self, item):
+        return item_id(item).hex() in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, idx, item, model, attempts):
+        """Append a failed item with its attempt history"""
+        record = {
+            'item_id': item_id(item).hex(),
+            'idx': idx,
+            'model': model,
+            'error_class': attempts[-1]['error_class'] if attempts else None,
+            'attempts': attempts,
+            'failed_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'item': item,
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.records[record['item_id']] = record
+            self.added += 1
+
+    def compact(self, done):
+        """Rewrite the file without items whose results are now in `done` (ResultStore.done)"""
+        with self._lock:
+            self.records = {key: r for key, r in self.records.items() if bytes.fromhex(key) not in done}
+            if not self.records:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in self.records.values():
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+
+    def print_stats(self):
+        print(f"Dead letters: {self.added} items added this run, {len(self.records)} waiting in {self.path}")
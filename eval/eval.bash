@@ -7,7 +7,16 @@ RESULT_DIR="path/to/your/result/dir"
 
 # ========== Processing Configuration ==========
 MODEL_NAME=gpt-4o # choose your model to evaluate
+# To evaluate several models in one pass, replace --model with e.g. --models "gpt-4o,gemini-2.5-pro"
+# To split a run across hosts, add --shard_index i --num_shards n on each host, then run
+# python VisualTrans/eval/merge_shards.py --model "$MODEL_NAME" --result_dir "$RESULT_DIR" before scoring
 THREADS=32
+ENGINE=thread # thread or async
+MAX_IN_FLIGHT=256 # concurrent requests for the async engine
+# To cut tail latency, add --request_timeout 120, and with the async engine
+# --hedge_percentile 95 --hedge_budget 0.05 to duplicate requests slower than p95
+# For large offline sweeps, add --mode batch to submit everything through the provider's Batch API
+# Items that keep failing land in $RESULT_DIR/dead_letter_$MODEL_NAME.jsonl; re-run them with --retry_dead_letters
 
 # ========== Run Evaluation ==========
 python VisualTrans/eval/eval_model.py \
@@ -15,10 +24,24 @@ python VisualTrans/eval/eval_model.py \
     --image_base "$IMAGE_BASE" \
     --result_dir "$RESULT_DIR" \
     --threads $THREADS \
+    --engine "$ENGINE" \
+    --max_in_flight $MAX_IN_FLIGHT \
     --model "$MODEL_NAME"
 
 
 # ========== Calculate Scores ==========
+# To watch accuracy while the evaluation is still running, run in another shell:
+# python VisualTrans/eval/cal_score.py --model "$MODEL_NAME" --result_dir "$RESULT_DIR" --follow
+# Per-item details go to eval_${MODEL_NAME}_score_detail.bin (questions shared in score_questions.jsonl);
+# add --detail_format json for the old indented JSON dump
+# To score every model in $RESULT_DIR in parallel and build leaderboard.csv (add --excel for result.xlsx):
+# python VisualTrans/eval/cal_score.py --result_dir "$RESULT_DIR" --all
+# Add --bootstrap 2000 for confidence intervals; to test whether two scored models really differ:
+# python VisualTrans/eval/significance.py --result_dir "$RESULT_DIR" --models "gpt-4o,gemini-2.5-pro"
+# Add --breakdown for accuracy by scene, question template and option letter, or slice further with e.g.
+# python VisualTrans/eval/breakdown.py --result_dir "$RESULT_DIR" --model "$MODEL_NAME" --by scene,label_letter
+# For dashboards, keep the scores of every model live behind a local JSON API (GET /leaderboard, /models/<name>):
+# python VisualTrans/eval/score_server.py --result_dir "$RESULT_DIR" --port 8900
 python VisualTrans/eval/cal_score.py \
     --model "$MODEL_NAME" \
     --result_dir "$RESULT_DIR"
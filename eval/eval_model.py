@@ -1,11 +1,27 @@
-import requests
-import base64
 import os
+import sys
 import json
 import argparse
 import time
+import asyncio
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from openai import OpenAI
+import httpx
+from openai import OpenAI, AsyncOpenAI, APITimeoutError
+from image_cache import ImageCache
+from image_preprocess import ImagePreprocessor, IMAGE_FORMATS
+from result_index import ResultStore, unique_indices
+from result_writer import ResultWriter
+from sharding import shard_path, shard_indices
+from run_stats import RunStats
+from hedging import Hedger
+from batch_mode import run_batch_mode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.response_cache import add_response_cache_args, response_cache_from_args, cached_completion, cached_completion_async
+from common.rate_limit import add_rate_limit_args, rate_limiter_from_args, is_rate_limit_error, backoff_delay
+from common.client_args import add_client_args, client_from_args
+from circuit_breaker import CircuitBreaker
+from dead_letter import DeadLetterLog, dead_letter_path, attempt_record
 
 SYSTEM_PROMPT = """
 I will show you two images:
@@ -58,122 +74,447 @@ client = OpenAI(
         base_url="base_url"
     )
 
-def encode_image(image_path):
-    if not os.path.exists(image_path):
-        raise FileNotFoundError(f"Image file not found: {image_path}")
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+# Reconfigured in main() from the command line preprocessing options
+image_preprocessor = ImagePreprocessor()
+
+# Shared by all items and retries so each image is encoded once per run
+image_cache = ImageCache(lambda path: image_preprocessor.encode(path), sizeof=lambda image: len(image.data_url))
+
+# Set in main() when --response_cache is given
+response_cache = None
+
+def build_messages(item, image_base):
+    """Build the chat messages for one benchmark item, returning them with the encoded images"""
+    encoded_images = []
+    for rel_path in item["images"]:
+        abs_path = os.path.join(image_base, rel_path)
+        encoded_images.append(image_cache.get(abs_path))
+
+    messages = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": SYSTEM_PROMPT + "\n\n" + item["question"]}
+            ] + [
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": image.data_url
+                    }
+                } for image in encoded_images
+            ]
+        }
+    ]
+    return messages, encoded_images
+
+def finish_timing(timing, submitted_at, item, encoded_images, retries):
+    """Complete a timing record for a successful item"""
+    timing['payload_bytes'] = sum(len(image.data_url) for image in encoded_images) + len(SYSTEM_PROMPT) + len(item['question'])
+    timing['retries'] = retries
+    timing['total_s'] = time.monotonic() - submitted_at
+    return {k: round(v, 4) if isinstance(v, float) else v for k, v in timing.items()}
 
-def process_item(idx, item, client, model, image_base):
+def process_item(idx, item, client, model, image_base, rate_limiter=None, submitted_at=None,
+                 breaker=None, dead_letters=None):
+    # Several models may answer the same benchmark item, keep it untouched
+    original = item
+    item = dict(item)
     max_retries = 3  # Maximum retry attempts
+    max_rate_limit_waits = 10  # Rate-limited responses are retried without using up attempts
     retry_delay = 2  # Retry interval (seconds)
+    attempt = rate_limit_waits = 0
+    submitted_at = submitted_at or time.monotonic()
+    timing = {'queue_wait_s': time.monotonic() - submitted_at, 'encode_s': 0.0}
+    history = []
     
-    for attempt in range(max_retries):
+    while True:
+        if breaker is not None:
+            breaker.wait()
         try:
-            base64_images = []
-            for rel_path in item["images"]:
-                abs_path = os.path.join(image_base, rel_path)
-                base64_images.append(encode_image(abs_path))
-
-            messages = [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": SYSTEM_PROMPT + "\n\n" + item["question"]}
-                    ] + [
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{b64img}"
-                            }
-                        } for b64img in base64_images
-                    ]
-                }
-            ]
+            encode_start = time.monotonic()
+            messages, encoded_images = build_messages(item, image_base)
+            request_start = time.monotonic()
+            timing['encode_s'] += request_start - encode_start
             
-            completion = client.chat.completions.create(
-                model=model,
-                messages=messages,
-            )
-            content = completion.choices[0].message.content
+            content = cached_completion(client, response_cache, model, messages, rate_limiter=rate_limiter)
+            timing['response_s'] = time.monotonic() - request_start
+            if breaker is not None:
+                breaker.record()
             item["assistant"] = content
+            item["image_resolutions"] = [[image.width, image.height] for image in encoded_images]
+            item["timing"] = finish_timing(timing, submitted_at, item, encoded_images, attempt + rate_limit_waits)
             # Ensure returned data contains index information
             if 'idx' not in item:
                 item['idx'] = idx
-            print(f"Item {idx+1} completed")
+            print(f"Item {idx+1} [{model}] completed")
             return item
             
         except Exception as e:
-            print(f"Item {idx+1} attempt {attempt+1} failed: {e}")
+            if breaker is not None:
+                breaker.record(e)
+            history.append(attempt_record(attempt + rate_limit_waits + 1, e, submitted_at))
+            if is_rate_limit_error(e) and rate_limit_waits < max_rate_limit_waits:
+                rate_limit_waits += 1
+                delay = backoff_delay(e, min(60, retry_delay * 2 ** (rate_limit_waits - 1)))
+                print(f"Item {idx+1} [{model}] rate limited, waiting {delay:.1f} seconds...")
+                time.sleep(delay)
+                continue
+
+            attempt += 1
+            if isinstance(e, APITimeoutError):
+                timing['timeouts'] = timing.get('timeouts', 0) + 1
+            print(f"Item {idx+1} [{model}] attempt {attempt} failed: {e}")
             
             # If not the last attempt, wait and retry
-            if attempt < max_retries - 1:
-                print(f"Waiting {retry_delay} seconds before retry...")
-                time.sleep(retry_delay)
+            if attempt < max_retries:
+                delay = backoff_delay(e, retry_delay)
+                print(f"Waiting {delay:.1f} seconds before retry...")
+                time.sleep(delay)
+                # Increase delay time for each retry
+                retry_delay *= 1.5
+            else:
+                print(f"Item {idx+1} [{model}] failed after {max_retries} attempts")
+                if dead_letters is not None:
+                    dead_letters.add(idx, original, model, history)
+                return None
+
+async def process_item_async(idx, item, client, model, image_base, semaphore, rate_limiter=None, submitted_at=None,
+                             hedger=None, breaker=None, dead_letters=None, request_timeout=None):
+    """Async counterpart of process_item.
+
+    The semaphore is only held while a request is in flight, so items waiting
+    out a retry delay do not occupy a slot. With a hedger, slow requests are
+    raced against a duplicate. request_timeout bounds each attempt, hedge
+    included.
+    """
+    original = item
+    item = dict(item)
+    max_retries = 3  # Maximum retry attempts
+    max_rate_limit_waits = 10  # Rate-limited responses are retried without using up attempts
+    retry_delay = 2  # Retry interval (seconds)
+    attempt = rate_limit_waits = 0
+    submitted_at = submitted_at or time.monotonic()
+    timing = {'encode_s': 0.0}
+    history = []
+
+    while True:
+        if breaker is not None:
+            await breaker.wait_async()
+        try:
+            async with semaphore:
+                encode_start = time.monotonic()
+                timing.setdefault('queue_wait_s', encode_start - submitted_at)
+                # Image encoding is blocking file I/O, keep it off the event loop
+                messages, encoded_images = await asyncio.to_thread(build_messages, item, image_base)
+                request_start = time.monotonic()
+                timing['encode_s'] += request_start - encode_start
+                request = lambda: cached_completion_async(client, response_cache, model, messages, rate_limiter=rate_limiter)
+                content = await asyncio.wait_for(hedger.call(request) if hedger is not None else request(), request_timeout)
+                timing['response_s'] = time.monotonic() - request_start
+            if breaker is not None:
+                breaker.record()
+            item["assistant"] = content
+            item["image_resolutions"] = [[image.width, image.height] for image in encoded_images]
+            item["timing"] = finish_timing(timing, submitted_at, item, encoded_images, attempt + rate_limit_waits)
+            # Ensure returned data contains index information
+            if 'idx' not in item:
+                item['idx'] = idx
+            print(f"Item {idx+1} [{model}] completed")
+            return item
+
+        except Exception as e:
+            if breaker is not None:
+                breaker.record(e)
+            history.append(attempt_record(attempt + rate_limit_waits + 1, e, submitted_at))
+            if is_rate_limit_error(e) and rate_limit_waits < max_rate_limit_waits:
+                rate_limit_waits += 1
+                delay = backoff_delay(e, min(60, retry_delay * 2 ** (rate_limit_waits - 1)))
+                print(f"Item {idx+1} [{model}] rate limited, waiting {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+                continue
+
+            attempt += 1
+            if isinstance(e, (APITimeoutError, asyncio.TimeoutError)):
+                timing['timeouts'] = timing.get('timeouts', 0) + 1
+            print(f"Item {idx+1} [{model}] attempt {attempt} failed: {e!r}")
+
+            # If not the last attempt, wait and retry
+            if attempt < max_retries:
+                delay = backoff_delay(e, retry_delay)
+                print(f"Waiting {delay:.1f} seconds before retry...")
+                await asyncio.sleep(delay)
                 # Increase delay time for each retry
                 retry_delay *= 1.5
             else:
-                print(f"Item {idx+1} failed after {max_retries} attempts")
+                print(f"Item {idx+1} [{model}] failed after {max_retries} attempts")
+                if dead_letters is not None:
+                    dead_letters.add(idx, original, model, history)
                 return None
 
+def run_thread_engine(jobs, image_base, request_timeout=None):
+    """Process (run, idx, item) jobs with one thread pool per model and the blocking client"""
+    runs = {id(run): run for run, _, _ in jobs}
+    run_client = client.with_options(timeout=request_timeout) if request_timeout else client
+    executors = {key: ThreadPoolExecutor(max_workers=run['concurrency']) for key, run in runs.items()}
+    submitted_at = time.monotonic()
+    futures = {
+        executors[id(run)].submit(process_item, idx, item, run_client, run['model'], image_base,
+                                  run['rate_limiter'], submitted_at, run['breaker'], run['dead_letters']): run
+        for run, idx, item in jobs
+    }
+
+    def collect(future):
+        result = future.result()
+        run = futures[future]
+        if result is not None:
+            run['writer'].put(result)
+            run['stats'].add(result)
+        else:
+            run['stats'].add_failure()
+
+    try:
+        for future in as_completed(futures):
+            collect(future)
+    except KeyboardInterrupt:
+        # Stop dispatching, but keep every result that is already finished or in flight
+        print("Interrupted, waiting for in-flight requests (Ctrl-C again to abort)...")
+        for future in futures:
+            future.cancel()
+        try:
+            for future in as_completed([f for f in futures if not f.cancelled()]):
+                collect(future)
+        except KeyboardInterrupt:
+            for future in futures:
+                if future.done() and not future.cancelled():
+                    collect(future)
+        raise
+    finally:
+        for executor in executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+async def run_async_engine(jobs, image_base, request_timeout=None):
+    """Process (run, idx, item) jobs on one event loop sharing a single HTTP connection pool"""
+    runs = {id(run): run for run, _, _ in jobs}
+    # Hedges run on top of the per-model concurrency, leave them room in the pool
+    pool_size = sum(run['concurrency'] * (2 if run.get('hedger') else 1) for run in runs.values())
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        timeout=httpx.Timeout(request_timeout or 600.0, connect=10.0),
+    )
+    # process_item_async retries on its own; SDK retries would hide failures from the breaker and rate limiter
+    async_client = AsyncOpenAI(api_key=client.api_key, base_url=client.base_url, max_retries=0, http_client=http_client)
+    semaphores = {key: asyncio.Semaphore(run['concurrency']) for key, run in runs.items()}
+
+    async def run_job(run, idx, item, submitted_at):
+        result = await process_item_async(idx, item, async_client, run['model'], image_base,
+                                          semaphores[id(run)], run['rate_limiter'], submitted_at,
+                                          run.get('hedger'), run['breaker'], run['dead_letters'], request_timeout)
+        # Handed to the writer as soon as it finishes, so Ctrl-C loses no finished result
+        if result is not None:
+            run['writer'].put(result)
+            run['stats'].add(result)
+        else:
+            run['stats'].add_failure()
+
+    async with async_client:
+        submitted_at = time.monotonic()
+        tasks = [asyncio.create_task(run_job(run, idx, item, submitted_at)) for run, idx, item in jobs]
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+
+def parse_model_concurrency(spec):
+    """Parse 'model_a=16,model_b=64' into a dict of per-model concurrency limits"""
+    limits = {}
+    for part in filter(None, (p.strip() for p in (spec or '').split(','))):
+        model, _, value = part.rpartition('=')
+        if not model:
+            raise ValueError(f"Invalid --model_concurrency entry: {part}")
+        limits[model] = int(value)
+    return limits
+
 def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Evaluate model performance')
-    parser.add_argument('--model', type=str, required=True, help='Model name to evaluate')
+    parser.add_argument('--model', type=str, default=None, help='Model name to evaluate')
+    parser.add_argument('--models', type=str, default=None, help='Comma-separated model names to evaluate in one pass over the benchmark')
+    parser.add_argument('--model_concurrency', type=str, default=None, help='Per-model concurrency overrides, e.g. gpt-4o=16,qwen-vl=64')
     parser.add_argument('--benchmark_path', type=str, required=True, help='Path to benchmark JSON file')
     parser.add_argument('--image_base', type=str, required=True, help='Base directory for images')
     parser.add_argument('--result_dir', type=str, required=True, help='Result directory')
-    parser.add_argument('--threads', type=int, default=32, help='Number of threads for concurrent processing')
+    parser.add_argument('--threads', type=int, default=32, help='Number of threads per model for concurrent processing')
+    parser.add_argument('--mode', type=str, default='online', choices=['online', 'batch'], help='Call the API per item (online) or submit everything through the Batch API')
+    parser.add_argument('--batch_poll_interval', type=float, default=30.0, help='Seconds between Batch API status checks')
+    parser.add_argument('--batch_max_requests', type=int, default=50000, help='Maximum requests per batch input file')
+    parser.add_argument('--batch_max_mb', type=float, default=190, help='Maximum size (MB) of a batch input file')
+    parser.add_argument('--engine', type=str, default='thread', choices=['thread', 'async'], help='Execution engine: thread pool or asyncio')
+    parser.add_argument('--max_in_flight', type=int, default=256, help='Maximum concurrent requests per model for the async engine')
+    parser.add_argument('--image_cache_mb', type=int, default=512, help='Memory budget (MB) for the encoded image cache')
+    parser.add_argument('--max_side', type=int, default=None, help='Downscale images so the longer side is at most this many pixels')
+    parser.add_argument('--image_format', type=str, default='original', choices=['original'] + list(IMAGE_FORMATS), help='Format images are re-encoded to before upload')
+    parser.add_argument('--jpeg_quality', type=int, default=90, help='Quality for JPEG/WebP re-encoding')
+    parser.add_argument('--preprocess_cache_dir', type=str, default=None, help='Directory for preprocessed images (default: <result_dir>/.preprocessed_images)')
+    parser.add_argument('--shard_index', type=int, default=0, help='Index of the shard evaluated by this process')
+    parser.add_argument('--num_shards', type=int, default=1, help='Number of shards the benchmark is split into (merge them with merge_shards.py)')
+    parser.add_argument('--write_batch_size', type=int, default=64, help='Results buffered before the writer commits them')
+    parser.add_argument('--write_interval_ms', type=int, default=200, help='Maximum time (ms) a result waits in the writer buffer')
+    parser.add_argument('--fsync', type=str, default='none', choices=['none', 'batch'], help='Whether to fsync the result file after each committed batch')
+    parser.add_argument('--request_timeout', type=float, default=None, help='Deadline (s) for each API request; timed out requests are retried')
+    parser.add_argument('--hedge_percentile', type=float, default=None, help='Send a duplicate request once a request is slower than this latency percentile (async engine only)')
+    parser.add_argument('--hedge_budget', type=float, default=0.05, help='Maximum fraction of requests that may be hedged')
+    parser.add_argument('--breaker_error_rate', type=float, default=0.5, help='Pause requests when this fraction of recent requests hit 5xx/connection errors (0 disables)')
+    parser.add_argument('--breaker_cooldown', type=float, default=30.0, help='Seconds the circuit breaker stays open before probing the backend')
+    parser.add_argument('--retry_dead_letters', action='store_true', help='Only re-run items recorded in dead_letter_{model}.jsonl')
+    add_response_cache_args(parser)
+    add_rate_limit_args(parser)
+    add_client_args(parser)
     args = parser.parse_args()
 
+    models = [m.strip() for m in args.models.split(',') if m.strip()] if args.models else []
+    if args.model:
+        models.insert(0, args.model)
+    if not models:
+        parser.error("one of --model or --models is required")
+    if args.hedge_percentile is not None and args.engine != 'async':
+        parser.error("--hedge_percentile requires --engine async")
+    models = list(dict.fromkeys(models))
+    model_concurrency = parse_model_concurrency(args.model_concurrency)
+    default_concurrency = args.max_in_flight if args.engine == 'async' else args.threads
+
+    global client, image_preprocessor, response_cache
+    client = client_from_args(args, client)
+    response_cache = response_cache_from_args(args)
+    image_preprocessor = ImagePreprocessor(
+        max_side=args.max_side,
+        image_format=args.image_format,
+        jpeg_quality=args.jpeg_quality,
+        cache_dir=args.preprocess_cache_dir or os.path.join(args.result_dir, ".preprocessed_images"),
+    )
+    image_cache.max_bytes = args.image_cache_mb * 1024 * 1024
 
-    # Read original data
+    # Read original data once for all models
     with open(args.benchmark_path, "r") as f:
         data = json.load(f)
 
-    # Check existing result file and get tested data
-    tested_keys = set()
-    eval_path = os.path.join(args.result_dir, f"eval_{args.model}.jsonl")
-    if os.path.exists(eval_path):
-        print(f"Found existing result file: {eval_path}")
-        print("Reading tested data...")
-        with open(eval_path, "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    item = json.loads(line.strip())
-                    # Use combination of question content and image paths as unique identifier
-                    question_key = item.get('question', '') + str(item.get('images', []))
-                    tested_keys.add(question_key)
-                except json.JSONDecodeError:
-                    continue
-        print(f"Found {len(tested_keys)} tested items")
-
-    # Filter untested data
-    untested_data = []
-    for idx, item in enumerate(data):
-        # Use combination of question content and image paths as unique identifier
-        question_key = item.get('question', '') + str(item.get('images', []))
-        if question_key not in tested_keys:
-            untested_data.append((idx, item))
-
-    print(f"Total data: {len(data)}")
-    print(f"Tested: {len(tested_keys)}")
-    print(f"To be tested: {len(untested_data)}")
-
-    if len(untested_data) == 0:
-        print("All data has been tested!")
+    # Results are keyed by item id in every mode (online, batch, shards), so
+    # an exact repeat of an earlier item is evaluated once
+    selected = unique_indices(data)
+    if len(selected) < len(data):
+        print(f"Skipping {len(data) - len(selected)} benchmark items that repeat an earlier item's question and images")
+    if args.num_shards > 1:
+        selected &= shard_indices(data, args.shard_index, args.num_shards)
+        print(f"Shard {args.shard_index}/{args.num_shards}: {len(selected)} items, "
+              f"{sum(len(data[idx]['images']) for idx in selected)} images")
+
+    runs = []
+    for model in models:
+        # Open the result file; its sidecar index tells which items are already tested
+        if args.num_shards > 1:
+            eval_path = shard_path(args.result_dir, model, args.shard_index, args.num_shards)
+        else:
+            eval_path = os.path.join(args.result_dir, f"eval_{model}.jsonl")
+        store = ResultStore(eval_path)
+        tested_count = len(store)
+        if tested_count:
+            print(f"Found existing result file: {eval_path}")
+            print(f"Found {tested_count} tested items")
+
+        dead_letters = DeadLetterLog(dead_letter_path(eval_path))
+
+        # Filter untested data
+        pending = {idx for idx in selected if data[idx] not in store}
+        if args.retry_dead_letters:
+            pending = {idx for idx in pending if data[idx] in dead_letters}
+            print(f"[{model}] Retrying {len(pending)} dead-lettered items")
+
+        print(f"[{model}] Total data: {len(selected)}")
+        print(f"[{model}] Tested: {tested_count}")
+        print(f"[{model}] To be tested: {len(pending)}")
+
+        if not pending:
+            print(f"[{model}] All data has been tested!")
+            store.close()
+            continue
+
+        concurrency = model_concurrency.get(model, default_concurrency)
+        runs.append({
+            'model': model,
+            'eval_path': eval_path,
+            'store': store,
+            'pending': pending,
+            'concurrency': concurrency,
+            'rate_limiter': rate_limiter_from_args(args, concurrency),
+            'hedger': Hedger(args.hedge_percentile, args.hedge_budget) if args.hedge_percentile is not None else None,
+            'breaker': CircuitBreaker(args.breaker_error_rate, cooldown=args.breaker_cooldown) if args.breaker_error_rate > 0 else None,
+            'dead_letters': dead_letters,
+        })
+
+    if not runs:
         return
 
+    # Dispatch item by item to every model, so each image is encoded once and
+    # reused by all models while it is still in the cache
+    jobs = [(run, idx, item) for idx, item in enumerate(data) for run in runs if idx in run['pending']]
+
     # Process untested data
-    with ThreadPoolExecutor(max_workers=args.threads) as executor, open(eval_path, "a", encoding="utf-8") as fout:
-        futures = [executor.submit(process_item, idx, item, client, args.model, args.image_base) for idx, item in untested_data]
-        for future in as_completed(futures):
-            result = future.result()
-            if result is not None:
-                fout.write(json.dumps(result, ensure_ascii=False) + "\n")
-                fout.flush()
+    for run in runs:
+        run['writer'] = ResultWriter(run['store'], batch_size=args.write_batch_size,
+                                     flush_interval=args.write_interval_ms / 1000, fsync=args.fsync)
+        run['stats'] = RunStats(run['model'])
+    try:
+        if args.mode == 'batch':
+            run_batch_mode(client, runs, data, build_messages, args.image_base, args.batch_poll_interval,
+                           args.batch_max_requests, int(args.batch_max_mb * 1024 * 1024))
+        elif args.engine == 'async':
+            asyncio.run(run_async_engine(jobs, args.image_base, args.request_timeout))
+        else:
+            run_thread_engine(jobs, args.image_base, args.request_timeout)
+    finally:
+        for run in runs:
+            run['stats'].finish()
+            run['writer'].close()
+            run['dead_letters'].compact(run['store'].done)
+            run['store'].close()
+            print(f"[{run['model']}] ", end="")
+            run['writer'].print_stats()
 
-    print(f"All completed, saved to {eval_path}")
+    image_cache.print_stats()
+    if response_cache is not None:
+        response_cache.print_stats()
+        response_cache.close()
+    for run in runs:
+        print(f"[{run['model']}] ", end="")
+        run['rate_limiter'].print_stats()
+        if run['hedger'] is not None:
+            print(f"[{run['model']}] ", end="")
+            run['hedger'].print_stats()
+        if run['breaker'] is not None:
+            print(f"[{run['model']}] ", end="")
+            run['breaker'].print_stats()
+        print(f"[{run['model']}] ", end="")
+        run['dead_letters'].print_stats()
+        # Summary JSON next to the result file: eval_{model}_summary.json
+        summary_path = run['eval_path'][:-len('.jsonl')] + '_summary.json'
+        limiter = run['rate_limiter']
+        extra = {
+            'writer': run['writer'].stats(),
+            'image_cache': image_cache.stats(),
+            'rate_limiter': {'concurrency_limit': limiter.limit, 'rate_limited': limiter.rate_limited,
+                             'overloaded': limiter.overloaded},
+        }
+        if run['hedger'] is not None:
+            extra['hedging'] = run['hedger'].stats()
+        if run['breaker'] is not None:
+            extra['circuit_breaker'] = run['breaker'].stats()
+        extra['dead_letters'] = {'added': run['dead_letters'].added, 'waiting': len(run['dead_letters'])}
+        if response_cache is not None:
+            extra['response_cache'] = {'hits': response_cache.hits, 'misses': response_cache.misses}
+        summary = run['stats'].write_summary(summary_path, extra=extra)
+        run['stats'].print_summary(summary)
+        print(f"All completed, saved to {run['eval_path']}, run summary in {summary_path}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
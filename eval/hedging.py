@@ -0,0 +1,84 @@
+"""
+Hedged requests for the async evaluation engine.
+
+A request still running once it has taken longer than a given percentile of the
+recent response times gets a duplicate; whichever finishes first is kept and
+the other is cancelled. Hedges are capped at a fraction of all requests so a
+slow backend is not flooded with duplicates.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from run_stats import percentile
+
+
+class Hedger:
+    def __init__(self, hedge_percentile=95, budget=0.05, min_samples=20, window=1000):
+        self.hedge_percentile = hedge_percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.cancelled = 0
+
+    def delay(self):
+        """Time after which a request is hedged, or None while there are too few samples"""
+        if len(self.latencies) < self.min_samples:
+            return None
+        return percentile(list(self.latencies), self.hedge_percentile)
+
+    def _can_hedge(self):
+        return self.hedged < self.budget * self.requests
+
+    async def call(self, make_request):
+        """Await make_request(), hedging it with a second call if it runs slow"""
+        self.requests += 1
+        start = time.monotonic()
+        primary = asyncio.ensure_future(make_request())
+        tasks = {primary}
+        try:
+            delay = self.delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self._can_hedge():
+                    self.hedged += 1
+                    tasks.add(asyncio.ensure_future(make_request()))
+            while True:
+                done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((t for t in done if t.exception() is None), None)
+                if winner is not None or not pending:
+                    break
+                # One copy failed while the other is still running, wait for it
+                tasks = pending
+            if winner is None:
+                return done.pop().result()
+            if winner is not primary:
+                self.hedge_wins += 1
+            self.latencies.append(time.monotonic() - start)
+            return winner.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                    self.cancelled += 1
+
+    def stats(self):
+        delay = self.delay()
+        return {
+            'hedge_percentile': self.hedge_percentile,
+            'hedge_budget': self.budget,
+            'hedge_delay_s': round(delay, 4) if delay is not None else None,
+            'requests': self.requests,
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins,
+            'cancelled': self.cancelled,
+        }
+
+    def print_stats(self):
+        s = self.stats()
+        print(f"Hedging: {s['hedged']} of {s['requests']} requests hedged, "
+              f"{s['hedge_wins']} won by the hedge, {s['cancelled']} cancelled")
@@ -0,0 +1,92 @@
+"""
+In-memory LRU cache for encoded benchmark images.
+
+Entries are keyed by (path, mtime, size), so an image that changes on disk is
+encoded again, and the least recently used entries are evicted once the byte
+budget is exceeded. Concurrent requests for the same image wait for a single
+encoding instead of repeating it.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+
+class ImageCache:
+    def __init__(self, encoder, max_bytes=512 * 1024 * 1024, sizeof=len):
+        self.encoder = encoder
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.peak_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, image_path):
+        """Return the encoded image, encoding it on a miss"""
+        try:
+            st = os.stat(image_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Image file not found: {image_path}")
+        key = (os.path.abspath(image_path), st.st_mtime_ns, st.st_size)
+
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+                pending = self._pending.get(key)
+                if pending is None:
+                    self.misses += 1
+                    pending = self._pending[key] = threading.Event()
+                    break
+            # Another thread is encoding this image, wait and look again
+            pending.wait()
+
+        try:
+            value = self.encoder(image_path)
+            self._insert(key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+
+    def _insert(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+            self.peak_bytes = max(self.peak_bytes, self.current_bytes)
+
+    def stats(self):
+        """Return hit/miss counters and memory usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'peak_bytes': self.peak_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def print_stats(self):
+        s = self.stats()
+        print(f"Image cache: {s['hits']} hits, {s['misses']} misses ({s['hit_rate']:.2%} hit rate), "
+              f"{s['evictions']} evictions, peak {s['peak_bytes'] / 1024 / 1024:.1f}/"
+              f"{s['max_bytes'] / 1024 / 1024:.0f} MB")
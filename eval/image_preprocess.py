@@ -0,0 +1,103 @@
+"""
+Optional downscaling and re-encoding of images before upload.
+
+Re-encoded images are stored on disk under a hash of the source bytes and the
+preprocessing settings, so each image is resized at most once across runs.
+"""
+
+import base64
+import hashlib
+import io
+import mimetypes
+import os
+from collections import namedtuple
+
+EncodedImage = namedtuple('EncodedImage', ['data_url', 'width', 'height'])
+
+# Output format name -> (Pillow format, MIME type, file extension)
+IMAGE_FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg', '.jpg'),
+    'png': ('PNG', 'image/png', '.png'),
+    'webp': ('WEBP', 'image/webp', '.webp'),
+}
+
+
+class ImagePreprocessor:
+    def __init__(self, max_side=None, image_format='original', jpeg_quality=90, cache_dir=None):
+        self.max_side = max_side
+        self.image_format = image_format
+        self.jpeg_quality = jpeg_quality
+        self.cache_dir = cache_dir
+
+    @property
+    def enabled(self):
+        return self.max_side is not None or self.image_format != 'original'
+
+    def encode(self, image_path):
+        """Return the image as a data URL together with its effective resolution"""
+        with open(image_path, "rb") as f:
+            raw = f.read()
+
+        if not self.enabled:
+            mime = mimetypes.guess_type(image_path)[0] or 'image/jpeg'
+            width, height = self._image_size(raw)
+            return self._to_encoded(raw, mime, width, height)
+
+        fmt = self._target_format(raw)
+        pil_format, mime, ext = IMAGE_FORMATS[fmt]
+        cache_path = None
+        if self.cache_dir:
+            cache_path = os.path.join(self.cache_dir, self._cache_key(raw, fmt) + ext)
+            if os.path.exists(cache_path):
+                with open(cache_path, "rb") as f:
+                    data = f.read()
+                width, height = self._image_size(data)
+                return self._to_encoded(data, mime, width, height)
+
+        data, width, height = self._resize_and_encode(raw, pil_format)
+        if cache_path:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+        return self._to_encoded(data, mime, width, height)
+
+    def _target_format(self, raw):
+        if self.image_format != 'original':
+            return self.image_format
+        from PIL import Image
+        with Image.open(io.BytesIO(raw)) as img:
+            source_format = (img.format or 'JPEG').lower()
+        return source_format if source_format in IMAGE_FORMATS else 'jpeg'
+
+    def _cache_key(self, raw, fmt):
+        h = hashlib.sha256(raw)
+        h.update(f"|{self.max_side}|{fmt}|{self.jpeg_quality}".encode())
+        return h.hexdigest()
+
+    def _resize_and_encode(self, raw, pil_format):
+        from PIL import Image
+        with Image.open(io.BytesIO(raw)) as img:
+            if self.max_side and max(img.size) > self.max_side:
+                img.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+            if pil_format == 'JPEG' and img.mode != 'RGB':
+                img = img.convert('RGB')
+            buf = io.BytesIO()
+            if pil_format in ('JPEG', 'WEBP'):
+                img.save(buf, format=pil_format, quality=self.jpeg_quality)
+            else:
+                img.save(buf, format=pil_format, optimize=True)
+            return buf.getvalue(), img.size[0], img.size[1]
+
+    @staticmethod
+    def _image_size(data):
+        from PIL import Image
+        # Only the header is parsed here, pixel data is never decoded
+        with Image.open(io.BytesIO(data)) as img:
+            return img.size
+
+    @staticmethod
+    def _to_encoded(data, mime, width, height):
+        b64 = base64.b64encode(data).decode('utf-8')
+        return EncodedImage(f"data:{mime};base64,{b64}", width, height)
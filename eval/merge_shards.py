@@ -0,0 +1,81 @@
+"""
+Merge per-shard evaluation results into eval_{model}.jsonl.
+
+Shard files written by `eval_model.py --shard_index i --num_shards n` live in
+<result_dir>/shards. Results already in the merged file are skipped, so merging
+can be repeated while shards are still running.
+"""
+
+import argparse
+import glob
+import json
+import os
+
+from result_index import ResultStore, item_id
+from sharding import shard_dir
+
+
+def read_complete_lines(path):
+    """Yield results from complete lines only; a shard may still be writing its last line"""
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def merge_model(result_dir, model, benchmark_path=None):
+    pattern = os.path.join(shard_dir(result_dir), f"eval_{glob.escape(model)}.shard*of*.jsonl")
+    shard_files = sorted(glob.glob(pattern))
+    if not shard_files:
+        print(f"No shard files found for {model} ({pattern})")
+        return 1
+
+    eval_path = os.path.join(result_dir, f"eval_{model}.jsonl")
+    store = ResultStore(eval_path)
+    existing = len(store)
+    merged = duplicates = 0
+    try:
+        for shard_file in shard_files:
+            batch = []
+            seen = set()
+            for result in read_complete_lines(shard_file):
+                key = item_id(result)
+                if key in store.done or key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                batch.append(result)
+            store.append_many(batch)
+            merged += len(batch)
+            print(f"{os.path.basename(shard_file)}: merged {len(batch)} results")
+    finally:
+        store.close()
+    print(f"Merged {merged} results into {eval_path} ({existing} already present, {duplicates} duplicates skipped)")
+
+    if benchmark_path:
+        with open(benchmark_path, "r") as f:
+            data = json.load(f)
+        missing = len({item_id(item) for item in data} - set(store.done))
+        print(f"{len(store.done)} results cover the benchmark, {missing} items still missing")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge sharded evaluation results')
+    parser.add_argument('--model', type=str, required=True, help='Comma-separated model name(s) to merge')
+    parser.add_argument('--result_dir', type=str, required=True, help='Result directory shared by all shards')
+    parser.add_argument('--benchmark_path', type=str, default=None, help='Benchmark JSON file, to report items still missing')
+    args = parser.parse_args()
+
+    status = 0
+    for model in [m.strip() for m in args.model.split(',') if m.strip()]:
+        status = merge_model(args.result_dir, model, args.benchmark_path) or status
+    return status
+
+
+if __name__ == "__main__":
+    exit(main())
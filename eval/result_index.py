@@ -0,0 +1,151 @@
+"""
+Append-only evaluation result file with a sidecar resume index.
+
+Next to eval_{model}.jsonl, eval_{model}.jsonl.idx holds one fixed-size binary
+record per result line: the 8-byte item id, the byte offset and length of the
+line, and a status byte. On startup only the index is read; lines appended
+after the last indexed one (a crash between the two writes, or files written
+before the index existed) are scanned and indexed, and a torn final line left
+by a crash is truncated away.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+
+INDEX_RECORD = struct.Struct("<8sQIB")
+STATUS_DONE = 1
+
+
+def question_id(question, images):
+    """Stable 8-byte id of a benchmark item, derived from its question and images"""
+    key = question + '\x00' + json.dumps(images, ensure_ascii=False)
+    return hashlib.sha1(key.encode('utf-8')).digest()[:8]
+
+
+def item_id(item):
+    return question_id(item.get('question', ''), item.get('images', []))
+
+
+def unique_indices(data):
+    """Indices of the first item with each item id; a repeated item is evaluated and scored once"""
+    first = {}
+    for idx, item in enumerate(data):
+        first.setdefault(item_id(item), idx)
+    return set(first.values())
+
+
+class ResultStore:
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + ".idx"
+        # item id -> (offset, length, status) of its line in the JSONL file
+        self.done = {}
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        data_size = os.path.getsize(path) if os.path.exists(path) else 0
+        indexed_end = self._load_index(data_size)
+        self._index = open(self.index_path, "ab")
+        if indexed_end < data_size:
+            self._index_tail(indexed_end)
+        self._data = open(path, "ab")
+
+    def _load_index(self, data_size):
+        """Read the index and return the end offset of the data it covers"""
+        if not os.path.exists(self.index_path):
+            return 0
+        with open(self.index_path, "rb") as f:
+            raw = f.read()
+        count = len(raw) // INDEX_RECORD.size
+        end = 0
+        for i in range(count):
+            key, offset, length, status = INDEX_RECORD.unpack_from(raw, i * INDEX_RECORD.size)
+            self.done[key] = (offset, length, status)
+            end = max(end, offset + length)
+
+        if end > data_size or (end and not self._ends_with_newline(end)):
+            # The index does not match the data file, rebuild it from scratch
+            print(f"Result index {self.index_path} is inconsistent, rebuilding")
+            self.done.clear()
+            open(self.index_path, "wb").close()
+            return 0
+        if len(raw) != count * INDEX_RECORD.size:
+            # Drop a partially written index record
+            with open(self.index_path, "r+b") as f:
+                f.truncate(count * INDEX_RECORD.size)
+        return end
+
+    def _ends_with_newline(self, end):
+        with open(self.path, "rb") as f:
+            f.seek(end - 1)
+            return f.read(1) == b"\n"
+
+    def _index_tail(self, start):
+        """Index complete lines after `start` and truncate a torn final line"""
+        indexed = 0
+        with open(self.path, "r+b") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if not line.endswith(b"\n"):
+                    print(f"Truncating incomplete last line at byte {offset} of {self.path}")
+                    f.truncate(offset)
+                    break
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError:
+                    offset += len(line)
+                    continue
+                self._add_index_record(item_id(item), offset, len(line))
+                indexed += 1
+                offset += len(line)
+        self._index.flush()
+        if indexed:
+            print(f"Indexed {indexed} results not yet in {self.index_path}")
+
+    def _add_index_record(self, key, offset, length, status=STATUS_DONE):
+        self._index.write(INDEX_RECORD.pack(key, offset, length, status))
+        self.done[key] = (offset, length, status)
+
+    def __contains__(self, item):
+        return item_id(item) in self.done
+
+    def __len__(self):
+        return len(self.done)
+
+    def append(self, result):
+        """Append one result line and its index record"""
+        self.append_many([result])
+
+    def append_many(self, results, fsync=False):
+        """Append a batch of results with one write to each file"""
+        keys = []
+        lines = []
+        for result in results:
+            key = item_id(result)
+            result.setdefault('item_id', key.hex())
+            keys.append(key)
+            lines.append((json.dumps(result, ensure_ascii=False) + "\n").encode('utf-8'))
+        with self._lock:
+            offset = self._data.tell()
+            self._data.write(b"".join(lines))
+            self._data.flush()
+            if fsync:
+                os.fsync(self._data.fileno())
+            # Written after the data, so a crash in between leaves unindexed
+            # lines that the next startup picks up from the tail scan
+            for key, line in zip(keys, lines):
+                self._add_index_record(key, offset, len(line))
+                offset += len(line)
+            self._index.flush()
+            if fsync:
+                os.fsync(self._index.fileno())
+
+    def close(self):
+        with self._lock:
+            self._data.close()
+            self._index.close()
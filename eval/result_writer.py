@@ -0,0 +1,92 @@
+"""
+Background writer that group-commits evaluation results.
+
+Results are queued by the engines and appended to the ResultStore by a single
+thread, once `batch_size` results are buffered or the oldest buffered result
+has waited `flush_interval` seconds. close() drains everything still queued.
+"""
+
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class ResultWriter:
+    def __init__(self, store, batch_size=64, flush_interval=0.2, fsync='none'):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.records = 0
+        self.batches = 0
+        self.write_seconds = 0.0
+        self._started = time.monotonic()
+        self._error = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, result):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(result)
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if not batch else max(0.0, deadline - time.monotonic())
+            try:
+                result = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                result = None
+            if result is _STOP:
+                self._flush(batch)
+                return
+            if result is not None:
+                batch.append(result)
+                if len(batch) == 1:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.batch_size:
+                    continue
+            self._flush(batch)
+            batch = []
+
+    def _flush(self, batch):
+        if not batch or self._error is not None:
+            return
+        start = time.monotonic()
+        try:
+            self.store.append_many(batch, fsync=self.fsync == 'batch')
+        except Exception as e:
+            print(f"Result writer failed: {e}")
+            self._error = e
+            return
+        self.write_seconds += time.monotonic() - start
+        self.records += len(batch)
+        self.batches += 1
+
+    def close(self):
+        """Flush all queued results and stop the writer thread"""
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def stats(self):
+        elapsed = time.monotonic() - self._started
+        return {
+            'records': self.records,
+            'batches': self.batches,
+            'write_seconds': self.write_seconds,
+            'records_per_second': self.records / elapsed if elapsed > 0 else 0.0,
+            'write_throughput': self.records / self.write_seconds if self.write_seconds > 0 else 0.0,
+        }
+
+    def print_stats(self):
+        s = self.stats()
+        avg_batch = s['records'] / s['batches'] if s['batches'] else 0.0
+        print(f"Result writer: {s['records']} results in {s['batches']} batches (avg {avg_batch:.1f}), "
+              f"{s['write_seconds'] * 1000:.1f} ms writing, {s['write_throughput']:.0f} results/s write throughput")
@@ -0,0 +1,111 @@
+"""
+Latency and throughput statistics for an evaluation run.
+
+Each completed result carries a `timing` record (queue wait, encode time,
+payload size, response time, retries, timed out attempts). RunStats collects
+them and writes a summary JSON with percentiles and requests per second,
+overall and broken down by task_type and scene.
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+
+TIMING_FIELDS = ['queue_wait_s', 'encode_s', 'response_s', 'total_s']
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile of a list of numbers (q in [0, 100])"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+def summarize(records):
+    """Aggregate a list of timing records into counts, means and percentiles"""
+    summary = {'count': len(records)}
+    if not records:
+        return summary
+    for field in TIMING_FIELDS:
+        values = [r[field] for r in records if r.get(field) is not None]
+        if values:
+            summary[field] = {
+                'mean': sum(values) / len(values),
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'p99': percentile(values, 99),
+                'max': max(values),
+            }
+    payloads = [r.get('payload_bytes', 0) for r in records]
+    summary['payload_bytes'] = {'mean': sum(payloads) / len(payloads), 'total': sum(payloads)}
+    summary['retries'] = sum(r.get('retries', 0) for r in records)
+    summary['timeouts'] = sum(r.get('timeouts', 0) for r in records)
+    return summary
+
+
+class RunStats:
+    def __init__(self, model):
+        self.model = model
+        self.started = time.monotonic()
+        self.finished = None
+        self.failed = 0
+        self._records = []
+        self._lock = threading.Lock()
+
+    def add(self, result):
+        timing = dict(result.get('timing', {}))
+        timing['task_type'] = result.get('task_type', 'unknown')
+        timing['scene'] = result.get('scene', 'unknown')
+        with self._lock:
+            self._records.append(timing)
+
+    def add_failure(self):
+        with self._lock:
+            self.failed += 1
+
+    def finish(self):
+        self.finished = time.monotonic()
+
+    def summary(self, extra=None):
+        with self._lock:
+            records = list(self._records)
+            failed = self.failed
+        elapsed = (self.finished or time.monotonic()) - self.started
+
+        summary = {
+            'model': self.model,
+            'wall_time_s': elapsed,
+            'completed': len(records),
+            'failed': failed,
+            'requests_per_second': len(records) / elapsed if elapsed > 0 else 0.0,
+            'overall': summarize(records),
+            'by_task_type': {},
+            'by_scene': {},
+        }
+        for key, target in (('task_type', 'by_task_type'), ('scene', 'by_scene')):
+            groups = defaultdict(list)
+            for record in records:
+                groups[record[key]].append(record)
+            summary[target] = {name: summarize(group) for name, group in sorted(groups.items())}
+        if extra:
+            summary.update(extra)
+        return summary
+
+    def write_summary(self, path, extra=None):
+        summary = self.summary(extra)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return summary
+
+    def print_summary(self, summary):
+        overall = summary['overall']
+        print(f"[{self.model}] {summary['completed']} completed, {summary['failed']} failed in "
+              f"{summary['wall_time_s']:.1f}s ({summary['requests_per_second']:.2f} req/s)")
+        total = overall.get('total_s')
+        if total:
+            print(f"[{self.model}] latency p50 {total['p50']:.2f}s, p95 {total['p95']:.2f}s, p99 {total['p99']:.2f}s")
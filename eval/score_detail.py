@@ -0,0 +1,176 @@
+"""
+Compact binary score-detail files.
+
+eval_{model}_score_detail.bin replaces the indent=2 JSON detail dump: one
+fixed-size record per scored item (item id, correctness and the location of
+the prediction in a string heap at the end of the file). Question text,
+images, scene and label are the same for every model, so they are stored
+once per result directory in score_questions.jsonl, keyed by item id.
+
+    header   8-byte magic, uint64 record count
+    records  count x RECORD (item_id, is_correct, pred_off, pred_len)
+    heap     UTF-8 predictions, concatenated
+
+ScoreDetail memory-maps a file with NumPy, so the correctness vectors of many
+models can be aligned and compared without parsing anything.
+"""
+
+import fcntl
+import json
+import os
+import struct
+from functools import reduce
+
+import numpy as np
+
+from result_index import question_id
+
+MAGIC = b'VTSCORE1'
+HEADER = struct.Struct('<8sQ')
+RECORD = np.dtype([('item_id', '<u8'), ('is_correct', 'u1'), ('pred_off', '<u4'), ('pred_len', '<u4')])
+QUESTIONS_FILE = 'score_questions.jsonl'
+QUESTION_FIELDS = ('task_type', 'scene', 'images', 'question', 'label')
+
+
+def result_columns(results, fields, defaults=None):
+    """{field: list of values} of a list of cal_score result dicts"""
+    defaults = defaults or {}
+    return {field: [result.get(field, defaults.get(field)) for result in results] for field in fields}
+
+
+def detail_path(result_dir, model, fmt='compact'):
+    suffix = '.bin' if fmt == 'compact' else '.json'
+    return os.path.join(result_dir, f"eval_{model}_score_detail{suffix}")
+
+
+def find_detail_path(result_dir, model):
+    """The model's most recently written detail file in either format, or None"""
+    paths = [path for path in (detail_path(result_dir, model, 'compact'), detail_path(result_dir, model, 'json'))
+             if os.path.exists(path)]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def read_questions(f):
+    """item id (uint64) -> shared question fields, from an open question table"""
+    questions = {}
+    for line in f:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            # A torn line left by an interrupted writer; the question is written again
+            continue
+        questions[int(record['item_id'], 16)] = record
+    return questions
+
+
+def load_questions(result_dir):
+    """item id (uint64) -> shared question fields"""
+    path = os.path.join(result_dir, QUESTIONS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return read_questions(f)
+
+
+def update_questions(result_dir, columns, keys):
+    """Append the questions not yet in the shared table"""
+    with open(os.path.join(result_dir, QUESTIONS_FILE), 'a+', encoding='utf-8') as f:
+        # Parallel writers (--all workers, concurrent cal_score runs) read and append under one lock,
+        # so each question is appended once
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        known = set(read_questions(f))
+        lines = []
+        for i, key in enumerate(keys):
+            if key in known:
+                continue
+            known.add(key)
+            record = {'item_id': f"{key:016x}"}
+            record.update({field: columns[field][i] for field in QUESTION_FIELDS})
+            lines.append(json.dumps(record, ensure_ascii=False) + '\n')
+        if lines:
+            f.write(''.join(lines))
+            f.flush()
+
+
+def write_score_detail(path, results):
+    """Write results (cal_score result dicts) to a compact detail file and the question table"""
+    columns = result_columns(results, QUESTION_FIELDS + ('pred', 'is_correct'), {'question': '', 'images': []})
+    keys = [int.from_bytes(question_id(question, images), 'little')
+            for question, images in zip(columns['question'], columns['images'])]
+    preds = [str(pred).encode('utf-8') for pred in columns['pred']]
+    records = np.zeros(len(keys), dtype=RECORD)
+    records['item_id'] = keys
+    records['is_correct'] = [bool(is_correct) for is_correct in columns['is_correct']]
+    records['pred_len'] = [len(pred) for pred in preds]
+    if len(preds):
+        records['pred_off'][1:] = np.cumsum(records['pred_len'][:-1], dtype=np.uint64)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(keys)))
+        f.write(records.tobytes())
+        f.write(b''.join(preds))
+    os.replace(tmp_path, path)
+    update_questions(os.path.dirname(path) or '.', columns, keys)
+
+
+class ScoreDetail:
+    """Read-only, memory-mapped view of a compact detail file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compact score detail file")
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        heap_start = HEADER.size + count * RECORD.itemsize
+        self.records = buffer[HEADER.size:heap_start].view(RECORD)
+        self.heap = buffer[heap_start:]
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def item_ids(self):
+        return self.records['item_id']
+
+    @property
+    def is_correct(self):
+        return self.records['is_correct'].astype(bool)
+
+    def pred(self, i):
+        offset, length = int(self.records['pred_off'][i]), int(self.records['pred_len'][i])
+        return self.heap[offset:offset + length].tobytes().decode('utf-8')
+
+    def results(self, questions):
+        """Result dicts in the cal_score format, without the raw assistant output"""
+        results = []
+        for i, key in enumerate(self.item_ids.tolist()):
+            question = questions.get(key, {})
+            result = {'idx': i + 1}
+            result.update({field: question.get(field) for field in QUESTION_FIELDS})
+            result['pred'] = self.pred(i)
+            result['is_correct'] = bool(self.records['is_correct'][i])
+            results.append(result)
+        return results
+
+
+def load_detail_results(path):
+    """Result dicts from a detail file in either format"""
+    if path.endswith('.bin'):
+        return ScoreDetail(path).results(load_questions(os.path.dirname(path) or '.'))
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def correct_matrix(details):
+    """Items scored in every detail: (sorted item ids, is_correct matrix models x items)"""
+    firsts = [np.unique(detail.item_ids, return_index=True) for detail in details]
+    common = reduce(np.intersect1d, [ids for ids, _ in firsts])
+    matrix = np.stack([
+        detail.is_correct[first[np.searchsorted(ids, common)]]
+        for detail, (ids, first) in zip(details, firsts)
+    ]) if details else np.zeros((0, 0), dtype=bool)
+    return common, matrix
@@ -0,0 +1,280 @@
+"""
+Long-running scoring service for dashboards.
+
+Keeps one IncrementalScorer per eval_{model}.jsonl in the result directory, so
+answer patterns are compiled once and each refresh only scores the lines
+appended since the last one (the same process_item scoring as cal_score.py,
+so the numbers match the CLI). A watcher thread rescans the directory every
+--interval seconds; replaced or truncated files are scored from the start.
+
+Endpoints (JSON), over TCP or a Unix socket (--socket):
+    GET  /health
+    GET  /leaderboard
+    GET  /models/{model}
+    GET  /models/{model}/details?offset=0&limit=100&assistant=0&is_correct=
+    GET  /models/{model}/breakdown?by=scene,label_letter
+    POST /refresh
+
+Usage:
+    python VisualTrans/eval/score_server.py --result_dir ./result --port 8900
+    python VisualTrans/eval/score_server.py --result_dir ./result --socket /tmp/visualtrans_score.sock
+    curl --unix-socket /tmp/visualtrans_score.sock http://localhost/leaderboard
+"""
+
+import argparse
+import json
+import os
+import re
+import signal
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from breakdown import DIMENSIONS, count_cells, letter_bias, parse_breakdown, rollup
+from cal_score import AnswerExtractor, IncrementalScorer, build_result_row, discover_models
+
+
+class ModelState:
+    """Incremental scorer of one model plus breakdown cell counts kept in step with it"""
+
+    def __init__(self, path, answer_patterns):
+        self.inode = os.stat(path).st_ino
+        self.scorer = IncrementalScorer(path, answer_patterns)
+        self.cells = {}
+        self.cells_upto = 0
+        self.updated_at = None
+        self.size = self.settled_size = None
+        self.lock = threading.Lock()
+
+    def update(self):
+        with self.lock:
+            results = self.scorer.results
+            size = os.path.getsize(self.scorer.eval_path) if os.path.exists(self.scorer.eval_path) else None
+            # A file that did not grow since the last refresh is finished, so a
+            # final line without a newline is a result rather than a partial write
+            at_eof = size == self.size and size != self.settled_size
+            added = self.scorer.update(at_eof=at_eof)
+            self.size = size
+            if at_eof:
+                self.settled_size = size
+            if self.scorer.results is not results:
+                # The scorer started over (truncated file), so do the cell counts
+                self.cells, self.cells_upto = {}, 0
+            if added:
+                self.updated_at = time.time()
+            return added
+
+    def breakdown_cells(self):
+        """Cell counts of all scored results, counting only those added since the last call"""
+        with self.lock:
+            results = self.scorer.results
+            for key, (total, correct) in count_cells(results[self.cells_upto:]).items():
+                cell = self.cells.setdefault(key, [0, 0])
+                cell[0] += total
+                cell[1] += correct
+            self.cells_upto = len(results)
+            return dict(self.cells)
+
+
+class ScoreService:
+    def __init__(self, result_dir, interval=2.0):
+        self.result_dir = result_dir
+        self.interval = interval
+        self.answer_patterns = AnswerExtractor()
+        self.models = {}
+        self.refreshes = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def refresh(self):
+        """Score new results of every model; returns {model: results added}"""
+        added = {}
+        with self._lock:
+            found = set(discover_models(self.result_dir))
+            for model in set(self.models) - found:
+                del self.models[model]
+            for model in sorted(found):
+                path = os.path.join(self.result_dir, f"eval_{model}.jsonl")
+                try:
+                    inode = os.stat(path).st_ino
+                except FileNotFoundError:
+                    continue
+                state = self.models.get(model)
+                if state is None or state.inode != inode:
+                    # New model, or the file was replaced (e.g. by merge_shards.py)
+                    state = self.models[model] = ModelState(path, self.answer_patterns)
+                count = state.update()
+                if count:
+                    added[model] = count
+            self.refreshes += 1
+        return added
+
+    def watch(self):
+        while not self._stop.is_set():
+            try:
+                added = self.refresh()
+            except Exception as e:
+                print(f"Warning: Refresh failed: {e}")
+                added = {}
+            for model, count in added.items():
+                print(f"[{time.strftime('%H:%M:%S')}] {model}: +{count} results")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        threading.Thread(target=self.watch, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def summary(self, model, state):
+        scorer = state.scorer
+        return {
+            'model': model,
+            'total': scorer.total,
+            'correct': scorer.correct,
+            'accuracy': scorer.correct / scorer.total if scorer.total else 0.0,
+            'task_groups': scorer.new_task_groups,
+            'updated_at': state.updated_at,
+        }
+
+    def leaderboard(self):
+        rows = []
+        for model, state in list(self.models.items()):
+            scorer = state.scorer
+            row = build_result_row(model, scorer.new_task_groups, scorer.total, scorer.correct)
+            if state.updated_at:
+                row['Timestamp'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(state.updated_at))
+            rows.append({**row, 'Total': scorer.total, 'Correct': scorer.correct})
+        return sorted(rows, key=lambda row: row['Overall'], reverse=True)
+
+
+class ScoreHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    service = None
+    verbose = False
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_found(self, message):
+        self.send_json(404, {'error': {'message': message}})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path.rstrip('/')
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if path == '/refresh':
+            return self.send_json(200, {'added': self.service.refresh()})
+        self.not_found(f'Unknown endpoint {path}')
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path, query = url.path.rstrip('/'), parse_qs(url.query)
+        if path == '/health':
+            return self.send_json(200, {'status': 'ok', 'models': len(self.service.models), 'refreshes': self.service.refreshes})
+        if path == '/leaderboard':
+            return self.send_json(200, {'models': self.service.leaderboard()})
+        match = re.fullmatch(r'/models/([^/]+)(?:/(details|breakdown))?', path)
+        if not match:
+            return self.not_found(f'Unknown endpoint {path}')
+        model, view = match.groups()
+        state = self.service.models.get(model)
+        if state is None:
+            return self.not_found(f'No results for model {model}')
+        try:
+            if view == 'details':
+                return self.send_json(200, self.details(state, query))
+            if view == 'breakdown':
+                return self.send_json(200, self.breakdown(state, query))
+        except (ValueError, argparse.ArgumentTypeError) as e:
+            return self.send_json(400, {'error': {'message': str(e)}})
+        self.send_json(200, self.service.summary(model, state))
+
+    def details(self, state, query):
+        offset = int(query.get('offset', ['0'])[0])
+        limit = int(query.get('limit', ['100'])[0])
+        with_assistant = query.get('assistant', ['0'])[0] == '1'
+        results = state.scorer.results
+        if 'is_correct' in query:
+            wanted = query['is_correct'][0] in ('1', 'true')
+            results = [result for result in results if result['is_correct'] == wanted]
+        page = results[offset:offset + limit]
+        if not with_assistant:
+            page = [{k: v for k, v in result.items() if k != 'assistant'} for result in page]
+        return {'total': len(results), 'offset': offset, 'results': page}
+
+    def breakdown(self, state, query):
+        cells = state.breakdown_cells()
+        dimensions = tuple(DIMENSIONS)
+        by = parse_breakdown(query.get('by', ['scene'])[0])
+        table = rollup(cells, by, dimensions)
+        rows = [{'key': list(key), 'total': total, 'correct': correct, 'accuracy': correct / total}
+                for key, (total, correct) in sorted(table.items())]
+        letters, biased = letter_bias(cells, dimensions=dimensions)
+        return {'by': list(by), 'rows': rows, 'letters': letters, 'biased_letters': biased}
+
+
+class TCPHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(args, service):
+    """HTTP server on --socket or --host/--port; call serve_forever() on it"""
+    handler = type('Handler', (ScoreHandler,), {'service': service, 'verbose': args.verbose})
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        return UnixHTTPServer(args.socket, handler)
+    return TCPHTTPServer((args.host, args.port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scoring service with a local JSON API')
+    parser.add_argument('--result_dir', type=str, required=True, help='Result directory to watch')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8900, help='Port to listen on')
+    parser.add_argument('--socket', type=str, default=None, help='Listen on this Unix socket instead of TCP')
+    parser.add_argument('--interval', type=float, default=2.0, help='Seconds between scans of the result directory')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    service = ScoreService(args.result_dir, args.interval)
+    added = service.refresh()
+    print(f"Scored {sum(added.values())} results of {len(service.models)} models in {args.result_dir}")
+    service.start()
+    server = make_server(args, service)
+    # Exit through the finally below on `kill` too, so the socket file is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Score server listening on {args.socket or f'http://{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == '__main__':
+    main()
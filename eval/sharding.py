@@ -0,0 +1,47 @@
+"""
+Deterministic partitioning of the benchmark across evaluation hosts.
+
+Items are grouped by their stable item id and assigned greedily, largest image
+count first and ties broken by id, to the shard with the smallest image load.
+Every host computes the same assignment from the same benchmark file, and the
+shards stay balanced even though procedural_interm items carry six images.
+"""
+
+import heapq
+import os
+
+from result_index import item_id
+
+
+def shard_dir(result_dir):
+    return os.path.join(result_dir, "shards")
+
+
+def shard_path(result_dir, model, shard_index, num_shards):
+    return os.path.join(shard_dir(result_dir), f"eval_{model}.shard{shard_index}of{num_shards}.jsonl")
+
+
+def assign_shards(data, num_shards):
+    """Return a list mapping each item index in `data` to its shard"""
+    groups = {}
+    for idx, item in enumerate(data):
+        groups.setdefault(item_id(item), []).append(idx)
+
+    # Heaviest groups first so the greedy assignment evens out
+    order = sorted(groups, key=lambda key: (-sum(len(data[i].get('images', [])) for i in groups[key]), key))
+    loads = [(0, shard) for shard in range(num_shards)]
+    assignment = [None] * len(data)
+    for key in order:
+        load, shard = heapq.heappop(loads)
+        for idx in groups[key]:
+            assignment[idx] = shard
+            load += len(data[idx].get('images', []))
+        heapq.heappush(loads, (load, shard))
+    return assignment
+
+
+def shard_indices(data, shard_index, num_shards):
+    """Return the set of item indices evaluated by one shard"""
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"shard_index must be in [0, {num_shards}), got {shard_index}")
+    return {idx for idx, shard in enumerate(assign_shards(data, num_shards)) if shard == shard_index}
@@ -0,0 +1,259 @@
+"""
+Bootstrap confidence intervals and paired significance tests for model scores.
+
+Works on the per-item is_correct vectors of the score detail files written by
+cal_score.py; compact files are memory-mapped and aligned by item id in NumPy.
+Resampling is done in bulk with NumPy: each batch of bootstrap resamples is
+one multinomial count matrix shared by every model, task group and scene, so
+group accuracies of all resamples come out of a single matrix product. Paired
+comparisons use the same resamples for both models, and the sign-flip
+permutation tests of all pairs and subsets share one random sign matrix per
+batch.
+
+Usage:
+    python eval/significance.py --result_dir ./result --models gpt-4o,gemini-2.5-pro
+    python eval/significance.py --result_dir ./result --models a,b,c --compare a b --resamples 10000
+"""
+
+import argparse
+import json
+from itertools import combinations
+
+import numpy as np
+
+from cal_score import GROUP_MAP
+from result_index import question_id
+from score_detail import ScoreDetail, correct_matrix, find_detail_path, load_detail_results, load_questions, result_columns
+
+# Resamples generated per batch, bounding the count matrix at chunk x items
+CHUNK = 1000
+
+
+def load_correct(detail_path):
+    """item id -> (is_correct, task group, scene) from a score detail file"""
+    return index_results(load_detail_results(detail_path))
+
+
+def index_results(results):
+    """item id -> (is_correct, task group, scene) of cal_score result dicts"""
+    columns = result_columns(results, ('question', 'images', 'is_correct', 'task_type', 'scene'),
+                             {'question': '', 'images': [], 'scene': 'unknown'})
+    items = {}
+    for question, images, is_correct, task_type, scene in zip(*columns.values()):
+        items.setdefault(question_id(question, images), (
+            bool(is_correct),
+            GROUP_MAP.get(task_type, task_type),
+            scene,
+        ))
+    return items
+
+
+def align(models_items):
+    """Items scored for every model: (correct matrix models x items, groups, scenes)"""
+    common = set.intersection(*(set(items) for items in models_items))
+    keys = sorted(common)
+    if not keys:
+        return np.zeros((len(models_items), 0), dtype=bool), np.array([]), np.array([])
+    first = models_items[0]
+    correct = np.array([[items[key][0] for key in keys] for items in models_items], dtype=bool)
+    groups = np.array([first[key][1] for key in keys])
+    scenes = np.array([first[key][2] for key in keys])
+    return correct, groups, scenes
+
+
+def align_compact(result_dir, paths):
+    """align() for compact detail files, without building per-item dicts; also returns the largest model size"""
+    details = [ScoreDetail(path) for path in paths]
+    ids, correct = correct_matrix(details)
+    questions = load_questions(result_dir)
+    fields = [questions.get(key, {}) for key in ids.tolist()]
+    groups = np.array([GROUP_MAP.get(q.get('task_type'), q.get('task_type')) for q in fields])
+    scenes = np.array([q.get('scene') or 'unknown' for q in fields])
+    return correct, groups, scenes, max(len(np.unique(detail.item_ids)) for detail in details)
+
+
+def subsets(groups, scenes):
+    """(name, boolean item mask) of overall, each task group and each scene"""
+    masks = [('Overall', np.ones(len(groups), dtype=bool))]
+    masks += [(name, groups == name) for name in sorted(set(groups))]
+    masks += [(f"scene:{name}", scenes == name) for name in sorted(set(scenes))]
+    return masks
+
+
+def resample_counts(rng, n, resamples):
+    """Yield multinomial count matrices (chunk x n): how often each item is drawn in a resample"""
+    for start in range(0, resamples, CHUNK):
+        size = min(CHUNK, resamples - start)
+        yield rng.multinomial(n, np.full(n, 1.0 / n), size=size).astype(np.float32)
+
+
+def bootstrap_accuracies(correct, masks, resamples=2000, seed=0):
+    """Bootstrap accuracy distribution of every model and subset: array (resamples, models, subsets)"""
+    n_models, n = correct.shape
+    mask_matrix = np.stack([mask for _, mask in masks], axis=1).astype(np.float32)  # n x subsets
+    # Item weights per (model, subset): correct items of the subset, then all items of the subset
+    hits = (correct[:, :, None] * mask_matrix[None]).transpose(1, 0, 2).reshape(n, -1)
+    rng = np.random.default_rng(seed)
+    out = []
+    for counts in resample_counts(rng, n, resamples):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            acc = (counts @ hits).reshape(-1, n_models, len(masks)) / (counts @ mask_matrix)[:, None, :]
+        out.append(acc)
+    return np.concatenate(out)
+
+
+def confidence_interval(samples, confidence=0.95):
+    """Percentile interval over the first axis, ignoring resamples where a subset was empty"""
+    alpha = (1 - confidence) / 2
+    return np.nanquantile(samples, alpha, axis=0), np.nanquantile(samples, 1 - alpha, axis=0)
+
+
+def permutation_pvalues(weights, permutations=10000, seed=0):
+    """Two-sided paired sign-flip test of sum == 0 for each column of weights (items x tests).
+
+    Each column holds the per-item differences of one model pair within one
+    subset (0 outside it); one matrix of random signs per batch is shared by
+    all tests.
+    """
+    observed = np.abs(weights.sum(axis=0))
+    rng = np.random.default_rng(seed)
+    extreme = np.zeros(weights.shape[1], dtype=np.int64)
+    for start in range(0, permutations, CHUNK):
+        size = min(CHUNK, permutations - start)
+        signs = (rng.integers(0, 2, size=(size, weights.shape[0]), dtype=np.int8) * 2 - 1).astype(np.float32)
+        extreme += (np.abs(signs @ weights) >= observed - 1e-6).sum(axis=0)
+    return (extreme + 1) / (permutations + 1)
+
+
+def compare_models(correct, masks, samples, pairs, confidence=0.95, permutations=10000, seed=0):
+    """Accuracy difference a - b per subset with a paired bootstrap CI and permutation p-value.
+
+    pairs is a list of (a, b) model indices; returns one list of subset rows per pair.
+    """
+    mask_matrix = np.stack([mask for _, mask in masks], axis=1).astype(np.float32)  # n x subsets
+    diffs = np.stack([correct[a].astype(np.float32) - correct[b].astype(np.float32) for a, b in pairs], axis=1)
+    weights = (diffs[:, :, None] * mask_matrix[:, None, :]).reshape(len(diffs), -1)
+    p_values = permutation_pvalues(weights, permutations, seed).reshape(len(pairs), len(masks))
+    counts = mask_matrix.sum(axis=0)
+    comparisons = []
+    for p, (a, b) in enumerate(pairs):
+        low, high = confidence_interval(samples[:, a, :] - samples[:, b, :], confidence)
+        rows = []
+        for s, (name, mask) in enumerate(masks):
+            if not counts[s]:
+                continue
+            rows.append({
+                'subset': name,
+                'items': int(counts[s]),
+                'diff': float(diffs[mask, p].mean()),
+                'ci_low': float(low[s]),
+                'ci_high': float(high[s]),
+                'p_value': float(p_values[p, s]),
+            })
+        comparisons.append(rows)
+    return comparisons
+
+
+def model_intervals(correct, masks, samples, confidence=0.95):
+    """Per model, per subset: accuracy with its bootstrap CI"""
+    low, high = confidence_interval(samples, confidence)
+    intervals = []
+    for m in range(correct.shape[0]):
+        rows = []
+        for s, (name, mask) in enumerate(masks):
+            if not mask.any():
+                continue
+            rows.append({
+                'subset': name,
+                'items': int(mask.sum()),
+                'accuracy': float(correct[m, mask].mean()),
+                'ci_low': float(low[m, s]),
+                'ci_high': float(high[m, s]),
+            })
+        intervals.append(rows)
+    return intervals
+
+
+def result_intervals(results, resamples=2000, confidence=0.95, seed=0):
+    """Accuracy CIs of one model's cal_score results, overall and per task group and scene"""
+    correct, groups, scenes = align([index_results(results)])
+    masks = subsets(groups, scenes)
+    samples = bootstrap_accuracies(correct, masks, resamples, seed)
+    return model_intervals(correct, masks, samples, confidence)[0]
+
+
+def print_intervals(model, rows, confidence=0.95):
+    print(f"\n{model} ({confidence:.0%} bootstrap CI)")
+    for row in rows:
+        print(f"  {row['subset']:<50}{row['items']:>6}  {row['accuracy']:7.2%}  "
+              f"[{row['ci_low']:7.2%}, {row['ci_high']:7.2%}]")
+
+
+def print_comparison(a, b, rows, confidence=0.95):
+    print(f"\n{a} vs {b}: accuracy difference ({confidence:.0%} paired bootstrap CI), sign-flip permutation p-value")
+    for row in rows:
+        marker = '*' if row['p_value'] < 1 - confidence else ''
+        print(f"  {row['subset']:<50}{row['items']:>6}  {row['diff']:+7.2%}  "
+              f"[{row['ci_low']:+7.2%}, {row['ci_high']:+7.2%}]  p={row['p_value']:.4f}{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bootstrap CIs and paired significance tests of model scores')
+    parser.add_argument('--result_dir', type=str, required=True, help='Result directory with the models\' score detail files')
+    parser.add_argument('--models', type=str, required=True, help='Comma-separated model names')
+    parser.add_argument('--compare', type=str, nargs=2, action='append', default=None, metavar=('A', 'B'),
+                        help='Pair of models to test (repeatable; default: every pair)')
+    parser.add_argument('--resamples', type=int, default=2000, help='Bootstrap resamples')
+    parser.add_argument('--permutations', type=int, default=10000, help='Sign-flip permutations per paired test')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level of the intervals')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--output', type=str, default=None, help='Also write the intervals and tests to this JSON file')
+    args = parser.parse_args()
+
+    models = [m.strip() for m in args.models.split(',') if m.strip()]
+    paths = []
+    for model in models:
+        detail_path = find_detail_path(args.result_dir, model)
+        if detail_path is None:
+            parser.error(f"no score detail file for {model} in {args.result_dir}, run cal_score.py first")
+        paths.append(detail_path)
+
+    if all(path.endswith('.bin') for path in paths):
+        correct, groups, scenes, largest = align_compact(args.result_dir, paths)
+    else:
+        models_items = [load_correct(path) for path in paths]
+        correct, groups, scenes = align(models_items)
+        largest = max(len(items) for items in models_items)
+    if not correct.shape[1]:
+        print("Error: The models have no scored items in common")
+        return 1
+    skipped = largest - correct.shape[1]
+    print(f"{correct.shape[1]} items scored for all {len(models)} models" + (f" ({skipped} others left out)" if skipped else ""))
+
+    masks = subsets(groups, scenes)
+    samples = bootstrap_accuracies(correct, masks, args.resamples, args.seed)
+    report = {'models': {}, 'comparisons': []}
+    for model, rows in zip(models, model_intervals(correct, masks, samples, args.confidence)):
+        print_intervals(model, rows, args.confidence)
+        report['models'][model] = rows
+
+    pairs = args.compare or list(combinations(models, 2))
+    for a, b in pairs:
+        if a not in models or b not in models:
+            parser.error(f"--compare {a} {b}: both models must be listed in --models")
+    # A single model only gets its intervals
+    comparisons = compare_models(correct, masks, samples, [(models.index(a), models.index(b)) for a, b in pairs],
+                                 args.confidence, args.permutations, args.seed) if pairs else []
+    for (a, b), rows in zip(pairs, comparisons):
+        print_comparison(a, b, rows, args.confidence)
+        report['comparisons'].append({'a': a, 'b': b, 'subsets': rows})
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nSaved to: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,8 +1,10 @@
 import base64
 import os
+import sys
 import json
 import argparse
 import shutil
+import time
 from pathlib import Path
 from openai import OpenAI
 from prompts_filter import FOOD_PROMPT, BOOKEND_PROMPT, BLOCK_PROMPT, BOWL_STACKING_PROMPT, SANDWICH_PROMPT, OTHER_PROMPT
@@ -10,11 +12,19 @@ import threading
 from concurrent.futures import ThreadPoolExecutor
 import concurrent.futures
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.response_cache import add_response_cache_args, response_cache_from_args, cached_completion
+from common.rate_limit import add_rate_limit_args, rate_limiter_from_args, is_rate_limit_error, backoff_delay
+from common.client_args import add_client_args, client_from_args
 
 client = OpenAI(
     api_key="your_api_key",
     base_url="your_base_url",
 )
+# Set in main() when --response_cache is given
+response_cache = None
+# Set in main() from the rate limiting options
+rate_limiter = None
 
 # Scene to prompt mapping
 def get_prompt(scene):
@@ -90,8 +100,20 @@ def process_pair(scene, prefix, start_img_path, end_img_path, output_base_dir, m
         ]}
     ]
     
-    completion = client.chat.completions.create(model=model_name, messages=messages)
-    reply = completion.choices[0].message.content
+    # Rate-limited requests are retried after the server's Retry-After delay
+    max_rate_limit_waits = 10
+    rate_limit_waits = 0
+    while True:
+        try:
+            reply = cached_completion(client, response_cache, model_name, messages, rate_limiter=rate_limiter)
+            break
+        except Exception as e:
+            if not is_rate_limit_error(e) or rate_limit_waits >= max_rate_limit_waits:
+                raise
+            rate_limit_waits += 1
+            delay = backoff_delay(e, min(60, 2 ** rate_limit_waits))
+            print(f"{scene}/{prefix} rate limited, waiting {delay:.1f} seconds...")
+            time.sleep(delay)
     
     final_answer = None
     for line in reply.splitlines():
@@ -211,8 +233,17 @@ def main():
     parser.add_argument('--model', default='o3', help='Model name')
     parser.add_argument('--max_workers', type=int, default=4, help='Maximum number of worker threads per scene')
     parser.add_argument('--move_filtered', action='store_true', help='Move filtered images to separate directory')
+    add_response_cache_args(parser)
+    add_rate_limit_args(parser)
+    add_client_args(parser)
 
     args = parser.parse_args()
+
+    global client, response_cache, rate_limiter
+    client = client_from_args(args, client)
+    response_cache = response_cache_from_args(args)
+    # Scenes run concurrently, each with its own pool of max_workers threads
+    rate_limiter = rate_limiter_from_args(args, args.max_workers * len(SCENES))
     
     # Set default filtered output directory if not provided
     if args.move_filtered and not args.filtered_image_dir:
@@ -241,6 +272,10 @@ def main():
                 print(f"✗ Scene {scene} failed with exception: {str(e)}")
     
     print("All scenes processing completed!")
+    rate_limiter.print_stats()
+    if response_cache is not None:
+        response_cache.print_stats()
+        response_cache.close()
     
     # Move filtered images if requested
     if args.move_filtered:
@@ -1,6 +1,7 @@
 import time
 import logging
 import os
+import sys
 from pathlib import Path
 from typing import List, Tuple, Dict, Set
 import base64
@@ -13,11 +14,19 @@ from openai import OpenAI
 import ast
 import argparse
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.response_cache import add_response_cache_args, response_cache_from_args, cached_completion
+from common.rate_limit import add_rate_limit_args, rate_limiter_from_args, is_rate_limit_error, backoff_delay
+from common.client_args import add_client_args, client_from_args
 
 client = OpenAI(
     api_key="your_api_key",
     base_url="base_url",
 )
+# Set in main() when --response_cache is given
+response_cache = None
+# Set in main() from the rate limiting options
+rate_limiter = None
 logger = logging.getLogger(__name__)
 logging.basicConfig(
     level=logging.INFO,
@@ -134,6 +143,9 @@ def find_image_samples(image_dir: str, scene_type: str):
 def call_llm(images, scene_type, model, crop_dir, image_dir, meta_output_dir):
     retry_count = 0
     max_retries = 3
+    # Rate-limited responses are retried without using up attempts
+    rate_limit_waits = 0
+    max_rate_limit_waits = 10
     
     while retry_count < max_retries:
         try:
@@ -149,8 +161,7 @@ def call_llm(images, scene_type, model, crop_dir, image_dir, meta_output_dir):
                         {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{end_b64}"}}
                     ]}
                 ]
-                completion1 = client.chat.completions.create(model=model, messages=messages1)
-                response1 = completion1.choices[0].message.content
+                response1 = cached_completion(client, response_cache, model, messages1, rate_limiter=rate_limiter)
                 result1 = parse_response(response1, scene_type, stage=1)
                 finish_state = result1.get('finish_state', 'none')
                 crop_scene_dir = os.path.join(crop_dir, scene_type)
@@ -173,8 +184,7 @@ def call_llm(images, scene_type, model, crop_dir, image_dir, meta_output_dir):
                             {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{crop_img_base64}"}}
                         ]}
                     ]
-                    completion2 = client.chat.completions.create(model=model, messages=messages2)
-                    response2 = completion2.choices[0].message.content
+                    response2 = cached_completion(client, response_cache, model, messages2, rate_limiter=rate_limiter)
                     result2 = parse_response(response2, scene_type, stage=2)
                 result = {**result1, **result2}
                 return result
@@ -187,15 +197,20 @@ def call_llm(images, scene_type, model, crop_dir, image_dir, meta_output_dir):
                         *[{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{b64}"}} for b64 in b64s]
                     ]}
                 ]
-                completion = client.chat.completions.create(model=model, messages=messages)
-                response = completion.choices[0].message.content
+                response = cached_completion(client, response_cache, model, messages, rate_limiter=rate_limiter)
                 return parse_response(response, scene_type, stage=1)
                 
         except Exception as e:
+            if is_rate_limit_error(e) and rate_limit_waits < max_rate_limit_waits:
+                rate_limit_waits += 1
+                delay = backoff_delay(e, min(60, 2 ** rate_limit_waits))
+                logger.warning(f"Rate limited for scene {scene_type}, waiting {delay:.1f}s")
+                time.sleep(delay)
+                continue
             retry_count += 1
             logger.warning(f"Attempt {retry_count} failed for scene {scene_type}: {str(e)}")
             if retry_count < max_retries:
-                time.sleep(2 ** retry_count)  # Exponential backoff
+                time.sleep(backoff_delay(e, 2 ** retry_count))  # Exponential backoff
             else:
                 # All retries failed, record failure information
                 image_path = str(Path(images[0]).relative_to(image_dir)).replace('_start.jpg', '.jpg')
@@ -377,54 +392,85 @@ def parse_response(response: str, scene_type: str, stage: int = 1) -> Dict:
 
 
 # ========== Sample Processing ==========
-def process_samples(samples, scene_type, model, image_dir, existing_results, crop_dir, meta_output_dir, num_threads=4):
-    def process_one_sample(sample):
-        try:
-            # First, extract start_img for path calculation
-            if scene_type == "play_reset_connect_four":
-                start_img, medium_img, end_img = sample
-            else:
-                start_img, end_img = sample
-            
-            rel = str(Path(start_img).relative_to(image_dir)).replace('_start.jpg', '.jpg')
-            if rel in existing_results:
-                return
+def sample_key(sample, image_dir):
+    """Image key of a sample as stored in the meta file"""
+    return str(Path(sample[0]).relative_to(image_dir)).replace('_start.jpg', '.jpg')
 
-            if scene_type == "play_reset_connect_four":
-                result = call_llm((start_img, medium_img, end_img), scene_type, model, crop_dir, image_dir, meta_output_dir)
-            elif scene_type in NON_API_SCENES:
-                result = {"image": rel}
-            else:
-                result = call_llm((start_img, end_img), scene_type, model, crop_dir, image_dir, meta_output_dir)
-            
-            result['image'] = rel
-            save_result(scene_type, result, meta_output_dir)
-            
-        except Exception as e:
-            logger.error(f"Failed to process sample {sample}: {str(e)}")
-            # Failure information is already recorded in call_llm, no need to record again here
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
-        executor.map(process_one_sample, samples)
-
-# ========== Main Process ==========
-def process_scene(scene_type, image_dir, crop_dir, model, num_threads, meta_output_dir):
-    """Function to process a single scene, used for multi-threaded calls"""
+def process_one_sample(sample, scene_type, model, image_dir, crop_dir, meta_output_dir):
+    """Annotate one sample and append it to the scene's meta file; returns False on failure"""
     try:
-        scene_image_dir = crop_dir if scene_type == "play_reset_connect_four" else image_dir
-        existing_results = load_existing_results(scene_type, meta_output_dir)
-        samples = find_image_samples(scene_image_dir, scene_type)
-        new_samples = [s for s in samples if (str(Path(s[0]).relative_to(scene_image_dir)).replace('_start.jpg', '.jpg') not in existing_results)]
-        
-        logger.info(f"{scene_type}: {len(existing_results)} existing, {len(new_samples)}/{len(samples)} new samples")
-        
-        if new_samples:
-            process_samples(new_samples, scene_type, model, scene_image_dir, existing_results, crop_dir, meta_output_dir, num_threads=num_threads)
-        
+        # First, extract start_img for path calculation
+        if scene_type == "play_reset_connect_four":
+            start_img, medium_img, end_img = sample
+        else:
+            start_img, end_img = sample
+        rel = sample_key(sample, image_dir)
+
+        if scene_type == "play_reset_connect_four":
+            result = call_llm((start_img, medium_img, end_img), scene_type, model, crop_dir, image_dir, meta_output_dir)
+        elif scene_type in NON_API_SCENES:
+            result = {"image": rel}
+        else:
+            result = call_llm((start_img, end_img), scene_type, model, crop_dir, image_dir, meta_output_dir)
+
+        result['image'] = rel
+        save_result(scene_type, result, meta_output_dir)
+        return True
+
     except Exception as e:
-        logger.error(f"Error processing scene {scene_type}: {str(e)}")
+        logger.error(f"Failed to process sample {sample}: {str(e)}")
+        # Failure information is already recorded in call_llm, no need to record again here
         return False
-    return True
+
+def pending_samples(scene_type, image_dir, crop_dir, meta_output_dir):
+    """Samples of a scene not yet in its meta file, and the directory their keys are relative to"""
+    scene_image_dir = crop_dir if scene_type == "play_reset_connect_four" else image_dir
+    existing_results = load_existing_results(scene_type, meta_output_dir)
+    samples = find_image_samples(scene_image_dir, scene_type)
+    new_samples = [s for s in samples if sample_key(s, scene_image_dir) not in existing_results]
+    logger.info(f"{scene_type}: {len(existing_results)} existing, {len(new_samples)}/{len(samples)} new samples")
+    return new_samples, scene_image_dir
+
+def round_robin(scene_samples):
+    """(scene, sample) pairs taking one sample from each scene in turn, so every scene progresses at the same pace"""
+    queues = [[(scene_type, sample) for sample in samples] for scene_type, samples in scene_samples.items()]
+    jobs = []
+    for i in range(max((len(queue) for queue in queues), default=0)):
+        jobs.extend(queue[i] for queue in queues if i < len(queue))
+    return jobs
+
+# ========== Main Process ==========
+def process_scenes(scenes, image_dir, crop_dir, model, num_threads, meta_output_dir):
+    """Annotate the pending samples of all scenes with one shared pool of num_threads workers.
+
+    Samples are queued round-robin across scenes, so small scenes are not
+    starved by large ones and no scene keeps threads idle. Returns
+    {scene: (done, failed, pending)}.
+    """
+    scene_samples, scene_dirs = {}, {}
+    for scene_type in scenes:
+        try:
+            scene_samples[scene_type], scene_dirs[scene_type] = pending_samples(scene_type, image_dir, crop_dir, meta_output_dir)
+        except Exception as e:
+            logger.error(f"Error listing scene {scene_type}: {str(e)}")
+
+    progress = {scene_type: [0, 0, len(samples)] for scene_type, samples in scene_samples.items()}
+    jobs = round_robin(scene_samples)
+    logger.info(f"Processing {len(jobs)} samples from {len(scene_samples)} scenes with {num_threads} threads")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
+        future_to_scene = {
+            executor.submit(process_one_sample, sample, scene_type, model, scene_dirs[scene_type], crop_dir, meta_output_dir): scene_type
+            for scene_type, sample in jobs
+        }
+        # Only this thread updates the counts
+        for future in concurrent.futures.as_completed(future_to_scene):
+            scene_type = future_to_scene[future]
+            counts = progress[scene_type]
+            counts[0 if future.result() else 1] += 1
+            finished = counts[0] + counts[1]
+            if finished == counts[2] or finished % 100 == 0:
+                logger.info(f"{scene_type}: {finished}/{counts[2]} samples ({counts[1]} failed)")
+    return {scene_type: tuple(counts) for scene_type, counts in progress.items()}
 
 def main():
     parser = argparse.ArgumentParser(description='Meta annotation generation script')
@@ -432,33 +478,34 @@ def main():
     parser.add_argument('--crop_dir', required=True, help='Crop directory')
     parser.add_argument('--meta_output_dir', required=True, help='Meta output directory')
     parser.add_argument('--model', default='gemini-2.5-pro', help='Model name')
-    parser.add_argument('--num_threads_per_scene', type=int, default=64, help='Number of threads per scene')
-    parser.add_argument('--max_scene_workers', type=int, default=8, help='Max concurrent scene workers')
+    parser.add_argument('--num_threads', type=int, default=64, help='Number of threads shared by all scenes')
+    add_response_cache_args(parser)
+    add_rate_limit_args(parser)
+    add_client_args(parser)
     
     args = parser.parse_args()
-    
-    logger.info(f"Processing {len(scene_name)} scenes (max {args.max_scene_workers} concurrent, {args.num_threads_per_scene} threads each)")
-    
-    success_count = 0
-    with concurrent.futures.ThreadPoolExecutor(max_workers=args.max_scene_workers) as executor:
-        future_to_scene = {
-            executor.submit(process_scene, scene_type, args.image_dir, args.crop_dir, args.model, args.num_threads_per_scene, args.meta_output_dir): scene_type 
-            for scene_type in scene_name
-        }
-        
-        for future in concurrent.futures.as_completed(future_to_scene):
-            scene_type = future_to_scene[future]
-            try:
-                success = future.result()
-                if success:
-                    success_count += 1
-                    logger.info(f"✓ {scene_type}")
-                else:
-                    logger.error(f"✗ {scene_type}")
-            except Exception as e:
-                logger.error(f"✗ {scene_type}: {str(e)}")
-    
+
+    global client, response_cache, rate_limiter
+    client = client_from_args(args, client)
+    response_cache = response_cache_from_args(args)
+    rate_limiter = rate_limiter_from_args(args, args.num_threads)
+
+    progress = process_scenes(scene_name, args.image_dir, args.crop_dir, args.model, args.num_threads, args.meta_output_dir)
+    for scene_type in scene_name:
+        if scene_type not in progress:
+            logger.error(f"✗ {scene_type}")
+            continue
+        done, failed, pending = progress[scene_type]
+        if failed:
+            logger.error(f"✗ {scene_type}: {failed}/{pending} samples failed")
+        else:
+            logger.info(f"✓ {scene_type}")
+    success_count = sum(1 for done, failed, pending in progress.values() if not failed)
     logger.info(f"Completed: {success_count}/{len(scene_name)} scenes successful")
+    rate_limiter.print_stats()
+    if response_cache is not None:
+        response_cache.print_stats()
+        response_cache.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -8,11 +8,6 @@ All paths and parameters are provided via command line arguments.
 import argparse
 import os
 
-import torch
-from PIL import Image
-from transformers import AutoProcessor, AutoModelForZeroShotObjectDetection
-from tqdm import tqdm
-
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--model_path', required=True, help='Path to the Grounding DINO model')
@@ -20,6 +15,12 @@ def main():
     parser.add_argument('--crop_dir', required=True, help='Root directory for output images')
     args = parser.parse_args()
 
+    # Heavy imports after argument parsing, so --help and usage errors return at once
+    import torch
+    from PIL import Image
+    from transformers import AutoProcessor, AutoModelForZeroShotObjectDetection
+    from tqdm import tqdm
+
     # Fixed configuration
     device = "cuda" if torch.cuda.is_available() else "cpu"
     
@@ -7,8 +7,7 @@ META_OUTPUT_DIR="path/to/your/meta/output/dir"
 
 # ========== Processing Configuration ==========
 MODEL="gemini-2.5-pro"  #your api model name
-MAX_SCENE_WORKERS=8
-NUM_THREADS_PER_SCENE=64
+NUM_THREADS=64 # shared by all scenes, samples are scheduled round-robin across scenes
 
 # ========== crop_with_grounding_dino ==========
 python VisualTrans/meta_annotation/crop_with_grounding_dino.py \
@@ -22,5 +21,4 @@ python VisualTrans/meta_annotation/add_meta.py \
     --crop_dir "$CROP_IMAGE_DIR" \
     --meta_output_dir "$META_OUTPUT_DIR" \
     --model "$MODEL" \
-    --num_threads_per_scene "$NUM_THREADS_PER_SCENE" \
-    --max_scene_workers "$MAX_SCENE_WORKERS"
+    --num_threads "$NUM_THREADS"
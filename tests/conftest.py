@@ -0,0 +1,43 @@
+import os
+import sys
+import threading
+from argparse import Namespace
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Scripts import their neighbours directly and `common` as a package
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'eval'))
+
+from common.client_args import client_from_args
+from common.mock_server import build_parser, make_server
+
+
+@pytest.fixture
+def mock_server():
+    """Start mock servers in this process: mock_server('--error_rate', '0.6') -> (base_url, MockState)"""
+    servers = []
+
+    def start(*options):
+        args = build_parser().parse_args(['--port', '0', '--latency', 'fixed', '--latency_ms', '1', '--seed', '0', *options])
+        server = make_server(args)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/v1", server.RequestHandlerClass.state
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def mock_client():
+    """OpenAI client for a mock server URL, built the way the scripts build theirs"""
+    from openai import OpenAI
+
+    def build(base_url):
+        return client_from_args(Namespace(base_url=base_url, api_key='mock'), OpenAI(api_key='unused', base_url=base_url))
+
+    return build
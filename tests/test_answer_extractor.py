@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from cal_score import AnswerExtractor, extract_answer, get_answer_patterns
+
+NON_ASCII_OUTPUTS = [
+    "<think>Rotated by 90° — clockwise.</think>\n<answer> B </answer>",
+    "The “red cup” moved.\nFinal Answer: red cup, blue bowl",
+    "**Final answer**:\xa0straße, café",
+    "<|begin_of_box|>Größe — 3<|end_of_box|>",
+    "Schritt 1 … FİNAL ANSWER: 2",
+    "fınal answer: C",
+    "Final anſwer: D",
+    "<ANSWER>K</ANSWER>",
+    "<start bbox>“plate”</start bbox> Final Answer: A",
+    "<answer>—</answer> <answer>A</answer>",
+    "Final Answer: <answer>°</answer>",
+    "<answer>unterminated — Final Answer: B",
+    "日本語の説明。<answer>３</answer>",
+    "no marker at all — 2",
+]
+
+MARKERS = ["<answer>", "</answer>", "<ANSWER>", "<|begin_of_box|>", "<|END_OF_BOX|>", "**Final answer**:",
+           "Final Answer:", "final anser:", "<start bbox>", "</start bbox>", "FİNAL ANSWER:", "fınal answer:"]
+FILLER = ["—", "°", "“", "”", "ß", "\xa0", "é", "日本", " ", "\n", "A", "2", "red cup", "ſ", "K", "answer"]
+
+
+@pytest.mark.parametrize("text", NON_ASCII_OUTPUTS)
+def test_extractor_matches_regexes_on_non_ascii_outputs(text):
+    assert extract_answer(text, AnswerExtractor()) == extract_answer(text, get_answer_patterns())
+
+
+def test_extractor_matches_regexes_on_random_outputs():
+    rng = random.Random(0)
+    extractor, patterns = AnswerExtractor(), get_answer_patterns()
+    for _ in range(5000):
+        text = "".join(rng.choice(MARKERS if rng.random() < 0.2 else FILLER) for _ in range(rng.randint(0, 30)))
+        assert extract_answer(text, extractor) == extract_answer(text, patterns), text
@@ -0,0 +1,54 @@
+import json
+import sys
+
+import pytest
+
+import eval_model
+from cal_score import AnswerExtractor, process_evaluation_file
+
+QUESTIONS = ['How many cups moved?', 'Which block is on top?\nA. red\nB. blue', 'How many cups moved?']
+
+
+@pytest.fixture
+def benchmark(tmp_path):
+    """Three items, the last an exact repeat of the first (like VisualTrans.json idx 300 and 306)"""
+    Image = pytest.importorskip('PIL.Image')
+    for name in ('a_start.jpg', 'a_end.jpg', 'b_start.jpg', 'b_end.jpg'):
+        Image.new('RGB', (8, 8)).save(tmp_path / name)
+    images = [['a_start.jpg', 'a_end.jpg'], ['b_start.jpg', 'b_end.jpg'], ['a_start.jpg', 'a_end.jpg']]
+    data = [{'task_type': 'count', 'scene': 'kitchen', 'images': item_images, 'question': question, 'label': '2'}
+            for question, item_images in zip(QUESTIONS, images)]
+    path = tmp_path / 'benchmark.json'
+    path.write_text(json.dumps(data), encoding='utf-8')
+    return path
+
+
+def run_eval(monkeypatch, benchmark, base_url, result_dir, *options):
+    # main() replaces these module globals; restore them after the test
+    for name in ('client', 'image_preprocessor', 'response_cache'):
+        monkeypatch.setattr(eval_model, name, getattr(eval_model, name))
+    monkeypatch.setattr(sys, 'argv', [
+        'eval_model.py', '--model', 'mock', '--benchmark_path', str(benchmark), '--image_base', str(benchmark.parent),
+        '--result_dir', str(result_dir), '--base_url', base_url, '--api_key', 'mock', *options])
+    eval_model.main()
+    with open(result_dir / 'eval_mock.jsonl', 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_batch_mode_end_to_end(mock_server, benchmark, tmp_path, monkeypatch):
+    base_url, state = mock_server('--batch_delay', '0')
+    results = run_eval(monkeypatch, benchmark, base_url, tmp_path / 'batch', '--mode', 'batch', '--batch_poll_interval', '0.05')
+
+    # The repeated item is submitted and written once
+    assert sorted(result['idx'] for result in results) == [0, 1]
+    assert all(result['assistant'] and result['image_resolutions'] == [[8, 8], [8, 8]] for result in results)
+    assert len(state.batches) == 1
+    assert not (tmp_path / 'batch' / 'eval_mock_batch_state.json').exists()
+    assert process_evaluation_file(str(tmp_path / 'batch' / 'eval_mock.jsonl'), AnswerExtractor())[1] == 2
+
+
+def test_online_and_batch_mode_evaluate_the_same_items(mock_server, benchmark, tmp_path, monkeypatch):
+    base_url, _ = mock_server('--batch_delay', '0')
+    online = run_eval(monkeypatch, benchmark, base_url, tmp_path / 'online')
+    batch = run_eval(monkeypatch, benchmark, base_url, tmp_path / 'batch', '--mode', 'batch', '--batch_poll_interval', '0.05')
+    assert sorted(result['idx'] for result in online) == sorted(result['idx'] for result in batch) == [0, 1]
@@ -0,0 +1,35 @@
+import pytest
+
+import eval_model
+from circuit_breaker import CircuitBreaker
+
+
+class CountingBreaker(CircuitBreaker):
+    """Circuit breaker that also counts the outcomes it is shown"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.recorded = 0
+
+    def record(self, error=None):
+        self.recorded += 1
+        super().record(error)
+
+
+def test_breaker_opens_on_injected_server_errors(mock_server, mock_client, tmp_path, monkeypatch):
+    Image = pytest.importorskip('PIL.Image')
+    Image.new('RGB', (8, 8)).save(tmp_path / 'a_start.jpg')
+    Image.new('RGB', (8, 8)).save(tmp_path / 'a_end.jpg')
+    monkeypatch.setattr(eval_model, 'backoff_delay', lambda error, default: 0.0)
+
+    base_url, state = mock_server('--error_rate', '0.6')
+    client = mock_client(base_url)
+    breaker = CountingBreaker(error_rate=0.5, min_requests=10, window=20, cooldown=0.01)
+    item = {'question': 'How many?', 'images': ['a_start.jpg', 'a_end.jpg'], 'label': '2'}
+    for idx in range(20):
+        eval_model.process_item(idx, item, client, 'mock', str(tmp_path), breaker=breaker)
+
+    # Without SDK retries every request the server answered is seen by the breaker
+    assert breaker.recorded == state.counters['requests']
+    assert state.counters['errors'] >= 10
+    assert breaker.times_opened >= 1
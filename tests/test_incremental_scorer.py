@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from cal_score import AnswerExtractor, IncrementalScorer, process_evaluation_file
+from score_server import ModelState
+
+ITEMS = [
+    {'task_type': 'count', 'question': 'q1', 'label': '3', 'assistant': '<answer>3</answer>'},
+    {'task_type': 'count', 'question': 'q2', 'label': '2', 'assistant': '<answer>2</answer>'},
+]
+
+
+@pytest.fixture
+def unterminated_file(tmp_path):
+    """Two results, the last one without a trailing newline"""
+    path = tmp_path / 'eval_m.jsonl'
+    path.write_text('\n'.join(json.dumps(item) for item in ITEMS), encoding='utf-8')
+    return path
+
+
+def test_finished_file_scores_last_line_without_newline(unterminated_file):
+    results, total, correct, _ = process_evaluation_file(str(unterminated_file), AnswerExtractor())
+    assert (total, correct) == (2, 2)
+    assert [result['question'] for result in results] == ['q1', 'q2']
+
+
+def test_follow_mode_holds_back_last_line_until_it_ends(unterminated_file):
+    scorer = IncrementalScorer(unterminated_file, AnswerExtractor())
+    assert scorer.update() == 1
+    with open(unterminated_file, 'a', encoding='utf-8') as f:
+        f.write('\n' + json.dumps(dict(ITEMS[0], question='q3')) + '\n')
+    assert scorer.update() == 2
+    assert [result['question'] for result in scorer.results] == ['q1', 'q2', 'q3']
+
+
+def test_torn_last_line_is_skipped_at_eof(tmp_path):
+    path = tmp_path / 'eval_m.jsonl'
+    path.write_text(json.dumps(ITEMS[0]) + '\n{"task_type": "cou', encoding='utf-8')
+    assert process_evaluation_file(str(path), AnswerExtractor())[1] == 1
+
+
+def test_score_server_scores_last_line_once_the_file_settles(unterminated_file):
+    state = ModelState(str(unterminated_file), AnswerExtractor())
+    assert state.update() == 1
+    assert state.update() == 1
+    assert state.update() == 0
+    assert state.scorer.total == 2
@@ -0,0 +1,28 @@
+from common.rate_limit import RateLimiter
+from common.response_cache import cached_completion
+
+MESSAGES = [{'role': 'user', 'content': [{'type': 'text', 'text': 'How many?'}]}]
+
+
+def test_adaptive_concurrency_shrinks_on_injected_429s(mock_server, mock_client):
+    base_url, state = mock_server('--rate_limit_rate', '1.0', '--retry_after', '0')
+    client = mock_client(base_url)
+    limiter = RateLimiter(max_concurrency=32, adaptive=True)
+    start_limit = limiter.limit
+
+    errors = 0
+    for _ in range(5):
+        try:
+            cached_completion(client, None, 'mock', MESSAGES, rate_limiter=limiter)
+        except Exception as e:
+            assert type(e).__name__ == 'RateLimitError'
+            errors += 1
+
+    assert errors == 5
+    # The SDK does not retry behind the limiter's back: one 429 per call
+    assert state.counters['rate_limited'] == limiter.rate_limited == 5
+    assert limiter.limit < start_limit
+
+
+def test_scripts_do_not_retry_inside_the_sdk(mock_client):
+    assert mock_client('http://127.0.0.1:1/v1').max_retries == 0
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+from common import response_cache
+from common.response_cache import ResponseCache, cached_completion_async
+
+MESSAGES = [{'role': 'user', 'content': [{'type': 'text', 'text': 'How many?'}]}]
+
+
+def accessed(cache, key):
+    return cache._conn.execute("SELECT accessed FROM responses WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_hits_write_access_times_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, 'TOUCH_BATCH', 3)
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    for key in 'abc':
+        cache.put(key, 'mock', key)
+    stored = {key: accessed(cache, key) for key in 'abc'}
+
+    cache.get('a')
+    cache.get('b')
+    assert [accessed(cache, key) for key in 'ab'] == [stored['a'], stored['b']]
+    cache.get('c')
+    assert all(accessed(cache, key) > stored[key] for key in 'abc')
+    assert cache.hits == 3
+
+
+def test_eviction_uses_pending_access_times(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), max_bytes=25)
+    cache.put('old', 'mock', 'x' * 10)
+    cache.put('new', 'mock', 'y' * 10)
+    # 'old' becomes the most recently used entry, but only in the pending batch
+    assert cache.get('old') is not None
+    cache.put('third', 'mock', 'z' * 10)
+    assert cache.get('new') is None
+    assert cache.get('old') is not None
+
+
+def test_access_times_are_written_on_close(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = ResponseCache(path)
+    cache.put('a', 'mock', 'a')
+    stored = accessed(cache, 'a')
+    cache.get('a')
+    cache.close()
+    assert accessed(ResponseCache(path), 'a') > stored
+
+
+def test_async_completion_uses_the_cache_off_the_event_loop(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    key = response_cache.request_fingerprint('mock', MESSAGES)
+    cache.put(key, 'mock', 'cached')
+    threads = []
+    get = cache.get
+    monkeypatch.setattr(cache, 'get', lambda key: threads.append(threading.current_thread()) or get(key))
+
+    async def run():
+        return await cached_completion_async(None, cache, 'mock', MESSAGES), threading.current_thread()
+
+    content, loop_thread = asyncio.run(run())
+    assert content == 'cached'
+    assert threads and threads[0] is not loop_thread
@@ -0,0 +1,28 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from cal_score import AnswerExtractor, process_item
+from score_detail import QUESTIONS_FILE, ScoreDetail, detail_path, load_questions, write_score_detail
+
+ITEMS = [
+    {'task_type': 'count', 'scene': 'kitchen', 'question': f'q{i}', 'images': [f'{i}.png'], 'label': '3',
+     'assistant': '<answer>3</answer>'}
+    for i in range(200)
+]
+
+
+def write_model(result_dir, model):
+    results = [process_item(item, AnswerExtractor(), i + 1) for i, item in enumerate(ITEMS)]
+    write_score_detail(detail_path(result_dir, model), results)
+
+
+def test_parallel_writers_add_each_question_once(tmp_path):
+    models = [f'm{i}' for i in range(8)]
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(write_model, [str(tmp_path)] * len(models), models))
+
+    lines = (tmp_path / QUESTIONS_FILE).read_text(encoding='utf-8').splitlines()
+    assert len(lines) == len(ITEMS)
+    questions = load_questions(str(tmp_path))
+    for model in models:
+        detail = ScoreDetail(detail_path(str(tmp_path), model))
+        assert all(int(key) in questions for key in detail.records['item_id'])
@@ -0,0 +1,29 @@
+import json
+import sys
+
+import pytest
+
+import significance
+from cal_score import AnswerExtractor, process_item, save_details
+
+ITEMS = [
+    {'task_type': 'count', 'scene': 'kitchen', 'question': f'q{i}', 'images': [f'{i}.png'], 'label': '3',
+     'assistant': f'<answer>{3 if i % 3 else 2}</answer>'}
+    for i in range(30)
+]
+
+
+@pytest.mark.parametrize('detail_format', ['compact', 'json'])
+def test_single_model_gets_intervals_without_comparisons(tmp_path, monkeypatch, capsys, detail_format):
+    results = [process_item(item, AnswerExtractor(), i + 1) for i, item in enumerate(ITEMS)]
+    save_details(results, tmp_path, 'a', detail_format)
+    output = tmp_path / 'report.json'
+    monkeypatch.setattr(sys, 'argv', ['significance.py', '--result_dir', str(tmp_path), '--models', 'a',
+                                      '--resamples', '200', '--output', str(output)])
+    assert significance.main() == 0
+    report = json.loads(output.read_text(encoding='utf-8'))
+    assert report['comparisons'] == []
+    overall = report['models']['a'][0]
+    assert overall['items'] == 30
+    assert overall['ci_low'] <= overall['accuracy'] <= overall['ci_high']
+    assert 'bootstrap CI' in capsys.readouterr().out